@@ -58,15 +58,35 @@ class OKXConfig:
     passphrase: str = ""
     # 是否使用测试网（模拟盘）
     use_testnet: bool = True
+    # 是否启用 WebSocket 推送（关闭时全部使用 REST 轮询）
+    ws_enabled: bool = True
     
     # API 端点
     MAINNET_URL: str = "https://www.okx.com"
     TESTNET_URL: str = "https://www.okx.com"  # OKX 测试网使用相同域名，通过 header 区分
     
+    # WebSocket 端点（模拟盘使用独立域名）
+    MAINNET_WS_URL: str = "wss://ws.okx.com:8443/ws/v5"
+    TESTNET_WS_URL: str = "wss://wspap.okx.com:8443/ws/v5"
+    
     @property
     def base_url(self) -> str:
         return self.TESTNET_URL if self.use_testnet else self.MAINNET_URL
     
+    @property
+    def ws_public_url(self) -> str:
+        """公共频道 WebSocket 地址"""
+        if self.use_testnet:
+            return f"{self.TESTNET_WS_URL}/public?brokerId=9999"
+        return f"{self.MAINNET_WS_URL}/public"
+    
+    @property
+    def ws_private_url(self) -> str:
+        """私有频道 WebSocket 地址"""
+        if self.use_testnet:
+            return f"{self.TESTNET_WS_URL}/private?brokerId=9999"
+        return f"{self.MAINNET_WS_URL}/private"
+    
     @property
     def simulated_trading(self) -> str:
         """返回模拟交易标志，1 表示模拟盘，0 表示实盘"""
@@ -186,6 +206,10 @@ class AppConfig:
     # 交易间隔（秒）
     check_interval: int = 5
     
+    # REST 行情 / 持仓查询缓存时间（毫秒），有效期内重复查询直接使用缓存
+    price_ttl_ms: int = 500
+    position_ttl_ms: int = 2000
+    
     @classmethod
     def from_env(cls) -> "AppConfig":
         """从环境变量加载配置"""
@@ -193,7 +217,8 @@ class AppConfig:
             api_key=os.getenv("OKX_API_KEY", ""),
             secret_key=os.getenv("OKX_SECRET_KEY", ""),
             passphrase=os.getenv("OKX_PASSPHRASE", ""),
-            use_testnet=os.getenv("OKX_USE_TESTNET", "true").lower() == "true"
+            use_testnet=os.getenv("OKX_USE_TESTNET", "true").lower() == "true",
+            ws_enabled=os.getenv("OKX_WS_ENABLED", "true").lower() == "true"
         )
         
         telegram_config = TelegramConfig(
@@ -235,7 +260,9 @@ class AppConfig:
             telegram=telegram_config,
             strategy=strategy_config,
             log_level=os.getenv("LOG_LEVEL", "INFO"),
-            check_interval=int(os.getenv("CHECK_INTERVAL", "5"))
+            check_interval=int(os.getenv("CHECK_INTERVAL", "5")),
+            price_ttl_ms=int(os.getenv("PRICE_TTL_MS", "500")),
+            position_ttl_ms=int(os.getenv("POSITION_TTL_MS", "2000"))
         )
 
 
@@ -6,6 +6,7 @@ SQLite 数据库模块
 import sqlite3
 import os
 import logging
+import threading
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass, field
@@ -52,19 +53,42 @@ class TradingDatabase:
         
         self.db_path = db_path
         self.logger = logging.getLogger(__name__)
+        # 每个线程复用一个长连接，sqlite3 按 SQL 文本缓存预编译语句，重复的增删改查不再重新解析
+        self._local = threading.local()
         self._init_database()
     
     def _get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """获取当前线程的数据库连接（首次调用时创建）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            # WAL 模式下 NORMAL 只在检查点时 fsync，断电最多丢失最近的提交，不会损坏数据库
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # 排序 / 临时表放在内存中，不写临时文件
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._local.conn = conn
+        elif conn.in_transaction:
+            # 写操作均在 with conn 中执行，正常情况下这里不会有未结束的事务；
+            # 不自动回滚（嵌套在外层 with conn 中调用时会丢弃外层已写入的部分），只记录警告
+            self.logger.warning("数据库连接存在未提交的事务，可能在事务中嵌套获取连接")
         return conn
     
+    def close(self):
+        """关闭当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
     def _init_database(self):
         """初始化数据库表"""
         conn = self._get_connection()
         cursor = conn.cursor()
         
+        # WAL 日志模式（持久保存在数据库文件中）：写入不阻塞读取，提交只追加日志
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         # 持仓批次表（FIFO 核心）
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS position_lots (
@@ -132,9 +156,18 @@ class TradingDatabase:
             )
         """)
         
+        # 索引：按交易对查询交易历史（按时间倒序），以及按交易对查询未平仓批次（FIFO 按时间升序）
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_trades_symbol_created
+            ON trades (symbol, created_at DESC)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_lots_symbol_open
+            ON position_lots (symbol, created_at) WHERE quantity > 0
+        """)
+        
         conn.commit()
-        conn.close()
-        self.logger.info(f"数据库初始化完成: {self.db_path}")
+        self.logger.info("数据库初始化完成: %s", self.db_path)
     
     # ==================== FIFO 持仓批次操作 ====================
     
@@ -162,6 +195,21 @@ class TradingDatabase:
         conn = self._get_connection()
         cursor = conn.cursor()
         
+        with conn:
+            lot_id = self._insert_position_lot(cursor, symbol, entry_price, quantity, is_manual, notes)
+        
+        return lot_id
+    
+    def _insert_position_lot(
+        self,
+        cursor: sqlite3.Cursor,
+        symbol: str,
+        entry_price: float,
+        quantity: float,
+        is_manual: bool,
+        notes: Optional[str]
+    ) -> int:
+        """在调用方事务中插入持仓批次（不提交）"""
         cursor.execute("""
             INSERT INTO position_lots (
                 symbol, entry_price, quantity, original_quantity, is_manual, notes
@@ -169,18 +217,16 @@ class TradingDatabase:
         """, (symbol, entry_price, quantity, quantity, 1 if is_manual else 0, notes))
         
         lot_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        self.logger.info(f"添加持仓批次: ID={lot_id}, {quantity}张 @ ${entry_price:.2f} {'(手动)' if is_manual else ''}")
+        self.logger.info("添加持仓批次: ID=%s, %s张 @ $%.2f %s", lot_id, quantity, entry_price, '(手动)' if is_manual else '')
         return lot_id
     
-    def get_position_lots(self, symbol: str) -> List[Dict]:
+    def get_position_lots(self, symbol: str, limit: int = None) -> List[Dict]:
         """
         获取所有未平仓的持仓批次（按时间排序，用于 FIFO）
         
         Args:
             symbol: 交易对
+            limit: 最多返回的批次数，None 表示全部
             
         Returns:
             持仓批次列表（按创建时间升序）
@@ -192,10 +238,10 @@ class TradingDatabase:
             SELECT * FROM position_lots 
             WHERE symbol = ? AND quantity > 0
             ORDER BY created_at ASC
-        """, (symbol,))
+            LIMIT ?
+        """, (symbol, -1 if limit is None else limit))
         
         rows = cursor.fetchall()
-        conn.close()
         
         return [dict(row) for row in rows]
     
@@ -206,15 +252,26 @@ class TradingDatabase:
         Returns:
             (总数量, 加权平均价格)
         """
-        lots = self.get_position_lots(symbol)
+        conn = self._get_connection()
+        cursor = conn.cursor()
         
-        if not lots:
-            return 0, 0
+        # 数量和成本在 SQL 中聚合，不逐行加载批次
+        cursor.execute("""
+            SELECT 
+                COUNT(*) AS lot_count,
+                COALESCE(SUM(quantity), 0) AS total_qty,
+                COALESCE(SUM(quantity * entry_price), 0) AS total_value
+            FROM position_lots 
+            WHERE symbol = ? AND quantity > 0
+        """, (symbol,))
         
-        total_qty = sum(lot['quantity'] for lot in lots)
-        total_value = sum(lot['quantity'] * lot['entry_price'] for lot in lots)
+        row = cursor.fetchone()
+        
+        if not row["lot_count"]:
+            return 0, 0
         
-        avg_price = total_value / total_qty if total_qty > 0 else 0
+        total_qty = row["total_qty"]
+        avg_price = row["total_value"] / total_qty if total_qty > 0 else 0
         
         return total_qty, avg_price
     
@@ -238,6 +295,19 @@ class TradingDatabase:
         conn = self._get_connection()
         cursor = conn.cursor()
         
+        with conn:
+            sell_result = self._sell_fifo(cursor, symbol, exit_price, quantity)
+        
+        return sell_result
+    
+    def _sell_fifo(
+        self,
+        cursor: sqlite3.Cursor,
+        symbol: str,
+        exit_price: float,
+        quantity: float
+    ) -> SellResult:
+        """在调用方事务中按 FIFO 扣减持仓批次（不提交）"""
         # 获取持仓批次（按时间升序）
         cursor.execute("""
             SELECT * FROM position_lots 
@@ -287,14 +357,10 @@ class TradingDatabase:
             remaining_to_sell -= sell_from_lot
             
             self.logger.info(
-                f"FIFO 匹配: 批次#{lot_id} 卖出 {sell_from_lot}张, "
-                f"买入价 ${lot_price:.2f} -> 卖出价 ${exit_price:.2f}, "
-                f"盈亏 ${pnl:.2f} ({pnl_pct:+.2f}%)"
+                "FIFO 匹配: 批次#%s 卖出 %s张, 买入价 $%.2f -> 卖出价 $%.2f, 盈亏 $%.2f (%+.2f%%)",
+                lot_id, sell_from_lot, lot_price, exit_price, pnl, pnl_pct
             )
         
-        conn.commit()
-        conn.close()
-        
         # 计算加权平均买入价
         actual_sold = quantity - remaining_to_sell
         avg_entry = total_cost / actual_sold if actual_sold > 0 else 0
@@ -331,7 +397,7 @@ class TradingDatabase:
         
         if db_qty > 0:
             # 数据库已有持仓记录
-            self.logger.info(f"数据库已有持仓: {db_qty}张 @ ${db_avg:.2f}")
+            self.logger.info("数据库已有持仓: %s张 @ $%.2f", db_qty, db_avg)
             return False
         
         if okx_quantity <= 0:
@@ -348,7 +414,7 @@ class TradingDatabase:
             notes=f"初始持仓同步: OKX 均价 ${okx_avg_price:.2f}"
         )
         
-        self.logger.info(f"同步初始持仓: {okx_quantity}张 @ ${okx_avg_price:.2f}")
+        self.logger.info("同步初始持仓: %s张 @ $%.2f", okx_quantity, okx_avg_price)
         return True
     
     def add_manual_position(
@@ -397,33 +463,26 @@ class TradingDatabase:
         Returns:
             (交易记录 ID, 持仓批次 ID)
         """
-        # 添加持仓批次
-        lot_id = self.add_position_lot(
-            symbol=symbol,
-            entry_price=entry_price,
-            quantity=quantity,
-            is_manual=is_manual,
-            notes=notes
-        )
-        
         contract_value = entry_price * quantity
         
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO trades (
-                symbol, direction, side, entry_price, quantity, 
-                contract_value, drop_type, drop_amount, status, lot_id, notes
-            ) VALUES (?, ?, 'BUY', ?, ?, ?, ?, ?, 'OPEN', ?, ?)
-        """, (symbol, direction, entry_price, quantity, contract_value, 
-              drop_type, drop_amount, lot_id, notes))
-        
-        trade_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with conn:
+            # 持仓批次和交易记录在同一事务中写入，只提交一次
+            lot_id = self._insert_position_lot(cursor, symbol, entry_price, quantity, is_manual, notes)
+            
+            cursor.execute("""
+                INSERT INTO trades (
+                    symbol, direction, side, entry_price, quantity, 
+                    contract_value, drop_type, drop_amount, status, lot_id, notes
+                ) VALUES (?, ?, 'BUY', ?, ?, ?, ?, ?, 'OPEN', ?, ?)
+            """, (symbol, direction, entry_price, quantity, contract_value, 
+                  drop_type, drop_amount, lot_id, notes))
+            
+            trade_id = cursor.lastrowid
         
-        self.logger.info(f"记录买入: 交易ID={trade_id}, 批次ID={lot_id}, {quantity}张 @ ${entry_price:.2f}")
+        self.logger.info("记录买入: 交易ID=%s, 批次ID=%s, %s张 @ $%.2f", trade_id, lot_id, quantity, entry_price)
         return trade_id, lot_id
     
     def record_sell_fifo(
@@ -441,40 +500,39 @@ class TradingDatabase:
         Returns:
             (交易记录 ID, SellResult)
         """
-        # FIFO 卖出
-        sell_result = self.sell_fifo(symbol, exit_price, quantity)
-        
-        if sell_result.total_quantity == 0:
-            self.logger.warning("无持仓可卖出")
-            return 0, sell_result
-        
-        contract_value = exit_price * sell_result.total_quantity
-        pnl_pct = (sell_result.total_pnl / (sell_result.avg_entry_price * sell_result.total_quantity)) * 100
-        
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        # 记录卖出交易
-        cursor.execute("""
-            INSERT INTO trades (
-                symbol, direction, side, entry_price, exit_price, quantity,
-                contract_value, pnl, pnl_pct, is_reserve, status, closed_at, notes
-            ) VALUES (?, ?, 'SELL', ?, ?, ?, ?, ?, ?, ?, 'CLOSED', CURRENT_TIMESTAMP, ?)
-        """, (symbol, direction, sell_result.avg_entry_price, exit_price, 
-              sell_result.total_quantity, contract_value, sell_result.total_pnl, 
-              pnl_pct, 1 if is_reserve else 0, notes))
-        
-        trade_id = cursor.lastrowid
-        
-        # 更新每日统计
-        self._update_daily_stats(conn, sell_result.total_pnl, contract_value)
-        
-        conn.commit()
-        conn.close()
+        with conn:
+            # FIFO 扣减、卖出记录和每日统计在同一事务中写入，只提交一次
+            sell_result = self._sell_fifo(cursor, symbol, exit_price, quantity)
+            
+            if sell_result.total_quantity == 0:
+                self.logger.warning("无持仓可卖出")
+                return 0, sell_result
+            
+            contract_value = exit_price * sell_result.total_quantity
+            pnl_pct = (sell_result.total_pnl / (sell_result.avg_entry_price * sell_result.total_quantity)) * 100
+            
+            # 记录卖出交易
+            cursor.execute("""
+                INSERT INTO trades (
+                    symbol, direction, side, entry_price, exit_price, quantity,
+                    contract_value, pnl, pnl_pct, is_reserve, status, closed_at, notes
+                ) VALUES (?, ?, 'SELL', ?, ?, ?, ?, ?, ?, ?, 'CLOSED', CURRENT_TIMESTAMP, ?)
+            """, (symbol, direction, sell_result.avg_entry_price, exit_price, 
+                  sell_result.total_quantity, contract_value, sell_result.total_pnl, 
+                  pnl_pct, 1 if is_reserve else 0, notes))
+            
+            trade_id = cursor.lastrowid
+            
+            # 更新每日统计
+            self._update_daily_stats(conn, sell_result.total_pnl, contract_value)
         
         self.logger.info(
-            f"记录卖出: ID={trade_id}, {sell_result.total_quantity}张 @ ${exit_price:.2f}, "
-            f"FIFO 均价 ${sell_result.avg_entry_price:.2f}, 盈亏 ${sell_result.total_pnl:.2f}"
+            "记录卖出: ID=%s, %s张 @ $%.2f, FIFO 均价 $%.2f, 盈亏 $%.2f",
+            trade_id, sell_result.total_quantity, exit_price,
+            sell_result.avg_entry_price, sell_result.total_pnl
         )
         
         return trade_id, sell_result
@@ -517,16 +575,15 @@ class TradingDatabase:
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO reserved_positions (symbol, entry_price, quantity, target_price, lot_id)
-            VALUES (?, ?, ?, ?, ?)
-        """, (symbol, entry_price, quantity, target_price, lot_id))
-        
-        reserve_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with conn:
+            cursor.execute("""
+                INSERT INTO reserved_positions (symbol, entry_price, quantity, target_price, lot_id)
+                VALUES (?, ?, ?, ?, ?)
+            """, (symbol, entry_price, quantity, target_price, lot_id))
+            
+            reserve_id = cursor.lastrowid
         
-        self.logger.info(f"添加保留仓位: ID={reserve_id}, {quantity}张 @ ${entry_price:.2f}")
+        self.logger.info("添加保留仓位: ID=%s, %s张 @ $%.2f", reserve_id, quantity, entry_price)
         return reserve_id
     
     def get_reserved_positions(self, symbol: str = None) -> List[Dict]:
@@ -547,7 +604,6 @@ class TradingDatabase:
             """)
         
         rows = cursor.fetchall()
-        conn.close()
         
         return [dict(row) for row in rows]
     
@@ -556,14 +612,12 @@ class TradingDatabase:
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            UPDATE reserved_positions 
-            SET status = 'CLOSED', closed_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (reserve_id,))
-        
-        conn.commit()
-        conn.close()
+        with conn:
+            cursor.execute("""
+                UPDATE reserved_positions 
+                SET status = 'CLOSED', closed_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (reserve_id,))
     
     def get_total_reserved_quantity(self, symbol: str = None) -> float:
         """获取保留仓位总张数"""
@@ -583,7 +637,6 @@ class TradingDatabase:
             """)
         
         row = cursor.fetchone()
-        conn.close()
         
         return row["total"] if row else 0
     
@@ -618,7 +671,6 @@ class TradingDatabase:
         
         cursor.execute(query, params)
         rows = cursor.fetchall()
-        conn.close()
         
         return [dict(row) for row in rows]
     
@@ -627,36 +679,35 @@ class TradingDatabase:
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        if symbol:
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_trades,
-                    SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END) as win_count,
-                    SUM(CASE WHEN pnl <= 0 THEN 1 ELSE 0 END) as loss_count,
-                    COALESCE(SUM(pnl), 0) as total_pnl,
-                    COALESCE(SUM(contract_value), 0) as total_volume
-                FROM trades 
-                WHERE side = 'SELL' AND symbol = ?
-            """, (symbol,))
-        else:
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_trades,
-                    SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END) as win_count,
-                    SUM(CASE WHEN pnl <= 0 THEN 1 ELSE 0 END) as loss_count,
-                    COALESCE(SUM(pnl), 0) as total_pnl,
-                    COALESCE(SUM(contract_value), 0) as total_volume
-                FROM trades WHERE side = 'SELL'
-            """)
+        # 交易统计、保留仓位和持仓批次汇总合并为一次查询（子查询共用同一交易对条件）
+        symbol_filter = " AND symbol = ?" if symbol else ""
+        cursor.execute(f"""
+            SELECT 
+                COUNT(*) as total_trades,
+                SUM(CASE WHEN pnl > 0 THEN 1 ELSE 0 END) as win_count,
+                SUM(CASE WHEN pnl <= 0 THEN 1 ELSE 0 END) as loss_count,
+                COALESCE(SUM(pnl), 0) as total_pnl,
+                COALESCE(SUM(contract_value), 0) as total_volume,
+                (SELECT COALESCE(SUM(quantity), 0) FROM reserved_positions
+                 WHERE status = 'ACTIVE'{symbol_filter}) as reserved_quantity,
+                (SELECT COALESCE(SUM(quantity), 0) FROM position_lots
+                 WHERE quantity > 0{symbol_filter}) as position_quantity,
+                (SELECT COALESCE(SUM(quantity * entry_price), 0) FROM position_lots
+                 WHERE quantity > 0{symbol_filter}) as position_value
+            FROM trades 
+            WHERE side = 'SELL'{symbol_filter}
+        """, (symbol,) * 4 if symbol else ())
         
         row = cursor.fetchone()
-        conn.close()
         
         total_trades = row["total_trades"] or 0
         win_count = row["win_count"] or 0
         
-        # 获取持仓信息
-        db_qty, db_avg = self.get_total_position(symbol) if symbol else (0, 0)
+        # 持仓信息仅在指定交易对时统计
+        db_qty, db_avg = 0, 0
+        if symbol and row["position_quantity"] > 0:
+            db_qty = row["position_quantity"]
+            db_avg = row["position_value"] / db_qty
         
         return {
             "total_trades": total_trades,
@@ -665,7 +716,7 @@ class TradingDatabase:
             "win_rate": (win_count / total_trades * 100) if total_trades > 0 else 0,
             "total_pnl": row["total_pnl"] or 0,
             "total_volume": row["total_volume"] or 0,
-            "reserved_quantity": self.get_total_reserved_quantity(symbol),
+            "reserved_quantity": row["reserved_quantity"],
             "position_quantity": db_qty,
             "position_avg_price": db_avg
         }
@@ -680,7 +731,6 @@ class TradingDatabase:
         
         cursor.execute("SELECT * FROM daily_stats WHERE date = ?", (date,))
         row = cursor.fetchone()
-        conn.close()
         
         if row:
             total_trades = row["total_trades"] or 0
@@ -705,20 +755,24 @@ class TradingDatabase:
                 "total_volume": 0
             }
     
-    def get_position_lots_summary(self, symbol: str) -> str:
-        """获取持仓批次摘要（用于显示）"""
-        lots = self.get_position_lots(symbol)
+    def get_position_lots_summary(self, symbol: str, limit: int = 20) -> str:
+        """获取持仓批次摘要（用于显示，最多列出 limit 个批次，合计仍按全部批次统计）"""
+        # 多取一行用于判断是否还有未列出的批次
+        lots = self.get_position_lots(symbol, limit=limit + 1)
         
         if not lots:
             return "无持仓"
         
         lines = []
-        for i, lot in enumerate(lots, 1):
+        for i, lot in enumerate(lots[:limit], 1):
             manual_tag = " (手动)" if lot['is_manual'] else ""
             lines.append(
                 f"  #{i}: {lot['quantity']:.0f}张 @ ${lot['entry_price']:.2f}{manual_tag}"
             )
         
+        if len(lots) > limit:
+            lines.append("  ...")
+        
         total_qty, avg_price = self.get_total_position(symbol)
         lines.append(f"  合计: {total_qty:.0f}张, 均价 ${avg_price:.2f}")
         
@@ -779,6 +833,8 @@ if __name__ == "__main__":
     print(f"  持仓批次:\n{db2.get_position_lots_summary('SOL-USDT-SWAP')}")
     
     # 清理测试数据库
+    db.close()
+    db2.close()
     os.remove("test_fifo.db")
     os.remove("test_sync.db")
     print("\n测试完成，已清理测试数据库")
@@ -2,6 +2,7 @@
 斐波那契网格交易策略模块
 根据价格动态计算目标持仓，在斐波那契关键点位触发买卖
 """
+import bisect
 import logging
 import random
 from dataclasses import dataclass, field
@@ -209,7 +210,7 @@ class TradeAction(Enum):
     SELL = "sell"      # 卖出
 
 
-@dataclass
+@dataclass(slots=True)
 class FibonacciSignal:
     """斐波那契交易信号"""
     action: TradeAction
@@ -231,6 +232,10 @@ class FibonacciStrategyEngine:
         
         # 计算所有斐波那契价格点位
         self.fib_levels = config.get_fib_prices()
+        # 点位价格（升序），供二分查找
+        self._fib_prices = [fib_price for _, fib_price, _ in self.fib_levels]
+        # 每个点位区间与价格无关的摘要字段，get_status_summary 直接复用
+        self._zone_summaries = [self._build_zone_summary(i) for i in range(len(self.fib_levels))]
         
         # 记录上次触发的价格点位索引
         self.last_triggered_index: Optional[int] = None
@@ -244,7 +249,7 @@ class FibonacciStrategyEngine:
         """打印斐波那契价格点位"""
         self.logger.info("=== 斐波那契网格点位 ===")
         for level, price, target_pos in self.fib_levels:
-            self.logger.info(f"  {level:.3f} -> ${price:.2f} -> 目标持仓 {target_pos} 张")
+            self.logger.info("  %.3f -> $%.2f -> 目标持仓 %s 张", level, price, target_pos)
     
     def is_price_in_range(self, price: float) -> bool:
         """检查价格是否在交易范围内"""
@@ -262,7 +267,9 @@ class FibonacciStrategyEngine:
         if price >= self.config.price_max:
             return 0
         
-        return get_target_position_at_price(price, self.fib_levels)
+        # 与 get_target_position_at_price 相同：取最后一个价格 <= price 的点位
+        i = bisect.bisect_right(self._fib_prices, price)
+        return self.fib_levels[max(i - 1, 0)][2]
     
     def find_nearest_fib_level(self, price: float) -> Tuple[int, float, float, int]:
         """
@@ -271,13 +278,10 @@ class FibonacciStrategyEngine:
         Returns:
             (index, fib_level, fib_price, target_position)
         """
-        for i, (level, fib_price, target_pos) in enumerate(self.fib_levels):
-            if price <= fib_price:
-                return i, level, fib_price, target_pos
-        
-        # 价格超过最高点
-        last = self.fib_levels[-1]
-        return len(self.fib_levels) - 1, last[0], last[1], last[2]
+        # 第一个价格 >= price 的点位；价格超过最高点时取最高点
+        i = min(bisect.bisect_left(self._fib_prices, price), len(self.fib_levels) - 1)
+        level, fib_price, target_pos = self.fib_levels[i]
+        return i, level, fib_price, target_pos
     
     def find_crossed_fib_level(
         self, 
@@ -291,12 +295,17 @@ class FibonacciStrategyEngine:
             如果穿越了，返回 (index, fib_level, fib_price, target_position)
             否则返回 None
         """
-        for i, (level, fib_price, target_pos) in enumerate(self.fib_levels):
-            # 下跌穿越：从上方跌破
-            if old_price > fib_price >= new_price:
+        if old_price > new_price:
+            # 下跌穿越：从上方跌破，取 [new_price, old_price) 内最低的点位
+            i = bisect.bisect_left(self._fib_prices, new_price)
+            if i < len(self._fib_prices) and self._fib_prices[i] < old_price:
+                level, fib_price, target_pos = self.fib_levels[i]
                 return i, level, fib_price, target_pos
-            # 上涨穿越：从下方突破
-            if old_price < fib_price <= new_price:
+        elif old_price < new_price:
+            # 上涨穿越：从下方突破，取 (old_price, new_price] 内最低的点位
+            i = bisect.bisect_right(self._fib_prices, old_price)
+            if i < len(self._fib_prices) and self._fib_prices[i] <= new_price:
+                level, fib_price, target_pos = self.fib_levels[i]
                 return i, level, fib_price, target_pos
         
         return None
@@ -436,30 +445,23 @@ class FibonacciStrategyEngine:
             reason=f"触发斐波那契 {level:.3f}，但持仓已达目标"
         )
     
-    def get_status_summary(self, current_price: float, current_position: int) -> dict:
-        """获取策略状态摘要"""
-        target_pos = self.calculate_target_position(current_price)
-        
-        # 找到当前价格所在的斐波那契区间
-        current_level_idx, current_level, current_fib_price, _ = self.find_nearest_fib_level(current_price)
+    def _build_zone_summary(self, index: int) -> dict:
+        """预先计算第 index 个点位区间的摘要（相邻买卖点位等与具体价格无关的字段）"""
+        current_level, current_fib_price, _ = self.fib_levels[index]
         
         # 下一个买入点位（更低的价格）
         next_buy_price = None
         next_buy_target = None
-        if current_level_idx > 0:
-            _, _, next_buy_price, next_buy_target = self.fib_levels[current_level_idx - 1]
+        if index > 0:
+            _, next_buy_price, next_buy_target = self.fib_levels[index - 1]
         
         # 下一个卖出点位（更高的价格）
         next_sell_price = None
         next_sell_target = None
-        if current_level_idx < len(self.fib_levels) - 1:
-            _, _, next_sell_price, next_sell_target = self.fib_levels[current_level_idx + 1]
+        if index < len(self.fib_levels) - 1:
+            _, next_sell_price, next_sell_target = self.fib_levels[index + 1]
         
         return {
-            "current_price": current_price,
-            "current_position": current_position,
-            "target_position": target_pos,
-            "position_diff": target_pos - current_position,
             "price_range": (self.config.price_min, self.config.price_max),
             "max_position": self.config.max_position,
             "current_fib_level": current_level,
@@ -470,6 +472,21 @@ class FibonacciStrategyEngine:
             "next_sell_target": next_sell_target,
             "fib_levels": self.fib_levels
         }
+    
+    def get_status_summary(self, current_price: float, current_position: int) -> dict:
+        """获取策略状态摘要"""
+        target_pos = self.calculate_target_position(current_price)
+        
+        # 找到当前价格所在的斐波那契区间，复用预先计算的区间摘要
+        current_level_idx = self.find_nearest_fib_level(current_price)[0]
+        
+        return {
+            "current_price": current_price,
+            "current_position": current_position,
+            "target_position": target_pos,
+            "position_diff": target_pos - current_position,
+            **self._zone_summaries[current_level_idx]
+        }
 
 
 # 测试代码
@@ -0,0 +1,31 @@
+"""
+JSON 编解码模块
+优先使用 orjson（C 扩展，序列化/解析更快），未安装时回退到标准库 json
+"""
+from typing import Any
+
+try:
+    import orjson
+
+    def dumps(obj: Any) -> str:
+        """序列化为紧凑 JSON 字符串"""
+        return orjson.dumps(obj).decode('utf-8')
+
+    def loads(data) -> Any:
+        """解析 JSON（支持 str / bytes）"""
+        return orjson.loads(data)
+
+    JSONDecodeError = orjson.JSONDecodeError
+
+except ImportError:
+    import json
+
+    def dumps(obj: Any) -> str:
+        """序列化为紧凑 JSON 字符串"""
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+    def loads(data) -> Any:
+        """解析 JSON（支持 str / bytes）"""
+        return json.loads(data)
+
+    JSONDecodeError = json.JSONDecodeError
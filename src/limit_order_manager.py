@@ -8,11 +8,17 @@
 
 二级单成交后，一级单保持不动（价格不变）
 """
+import bisect
 import logging
+import os
+import queue
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Tuple
+from functools import lru_cache, partial
+from types import MappingProxyType
+from typing import Optional, Dict, List, Mapping, Tuple
 from datetime import datetime
 
 from okx_client import OKXClient
@@ -22,24 +28,34 @@ from database import TradingDatabase
 
 
 # 价格随机偏移小数部分 (.2, .3, .6, .7)
-ALLOWED_OFFSETS = [0.2, 0.3, 0.6, 0.7]
+ALLOWED_OFFSETS = (0.2, 0.3, 0.6, 0.7)
+
+# 随机偏移下标位数：4 个偏移正好用 2 个随机比特索引，省去 random.choice 的浮点乘法
+OFFSET_INDEX_BITS = 2
+assert len(ALLOWED_OFFSETS) == 1 << OFFSET_INDEX_BITS
+
+_randbits = random.getrandbits
 
 # 二级订单额外偏移（美元）
 LEVEL2_EXTRA_OFFSET = 1.0
 
+# 每 1 美元的最小价格变动单位数（SOL-USDT-SWAP 最小变动 0.01），用于量化缓存键
+PRICE_TICKS_PER_UNIT = 100
+
 
 def get_random_offset() -> float:
     """获取随机价格偏移"""
-    return random.choice(ALLOWED_OFFSETS)
+    return ALLOWED_OFFSETS[_randbits(OFFSET_INDEX_BITS)]
 
 
-def adjust_buy_price(base_price: float, is_level2: bool = False) -> float:
+def adjust_buy_price(base_price: float, is_level2: bool = False, offset: float = None) -> float:
     """
     调整买入价格：略低于基准价格
     
     Args:
         base_price: 斐波那契基准价格
         is_level2: 是否为二级订单
+        offset: 指定偏移（默认随机选取）
         
     Returns:
         调整后的价格
@@ -47,7 +63,8 @@ def adjust_buy_price(base_price: float, is_level2: bool = False) -> float:
     一级: $130.00 -> $129.2 / $129.3 / $129.6 / $129.7
     二级: 在随机偏移基础上再 -1U -> $128.2 / $128.3 / $128.6 / $128.7
     """
-    offset = get_random_offset()
+    if offset is None:
+        offset = get_random_offset()
     price = round(base_price - 1 + offset, 1)
     
     if is_level2:
@@ -56,13 +73,14 @@ def adjust_buy_price(base_price: float, is_level2: bool = False) -> float:
     return price
 
 
-def adjust_sell_price(base_price: float, is_level2: bool = False) -> float:
+def adjust_sell_price(base_price: float, is_level2: bool = False, offset: float = None) -> float:
     """
     调整卖出价格：略高于基准价格
     
     Args:
         base_price: 斐波那契基准价格
         is_level2: 是否为二级订单
+        offset: 指定偏移（默认随机选取）
         
     Returns:
         调整后的价格
@@ -70,7 +88,8 @@ def adjust_sell_price(base_price: float, is_level2: bool = False) -> float:
     一级: $137.08 -> $137.3 / $137.4 / $137.7 / $137.8
     二级: 在随机偏移基础上再 +1U -> $138.3 / $138.4 / $138.7 / $138.8
     """
-    offset = get_random_offset()
+    if offset is None:
+        offset = get_random_offset()
     price = round(base_price + offset, 1)
     
     if is_level2:
@@ -79,7 +98,7 @@ def adjust_sell_price(base_price: float, is_level2: bool = False) -> float:
     return price
 
 
-@dataclass
+@dataclass(slots=True)
 class LimitOrder:
     """限价单信息"""
     order_id: str           # OKX 订单 ID
@@ -95,6 +114,27 @@ class LimitOrder:
     filled_at: datetime = None
 
 
+# 客户端订单 ID 前缀最大长度（fib + 方向 + 级别 5 位，计数器预留 7 位，共 32 位）
+CLIENT_ID_PREFIX_LEN = 20
+
+# 批量撤单接口单次最多订单数
+CANCEL_BATCH_SIZE = 20
+
+# 查询订单接口返回的"订单不存在"错误码
+ORDER_NOT_EXIST_CODE = "51603"
+
+# update_orders 无任何改动时返回的共享只读结果
+EMPTY_UPDATE_RESULT: Mapping = MappingProxyType({
+    "buy_orders": (),
+    "sell_orders": (),
+    "filled_orders": (),
+    "canceled_orders": ()
+})
+
+# get_status 输出的订单字段
+STATUS_FIELDS = ("order_id", "price", "quantity", "fib_level", "fib_price", "level")
+
+
 class LimitOrderManager:
     """限价单管理器 - 支持一级和二级限价单"""
     
@@ -113,6 +153,18 @@ class LimitOrderManager:
         self.symbol = symbol
         self.logger = logging.getLogger(__name__)
         
+        # 限价单请求体构造：交易对 / 保证金模式 / 订单类型固定，预先绑定
+        self._build_limit_order = partial(
+            OKXClient.build_order_data,
+            inst_id=symbol,
+            td_mode="cross",
+            order_type="limit"
+        )
+        
+        # 相邻点位查询缓存（按最小变动单位量化后的价格），行情不动时直接命中
+        self._adjacent_cache = lru_cache(maxsize=4096)(self._adjacent_levels_for_tick)
+        self.refresh_fib_levels()
+        
         # 当前活跃的限价单（一级）
         self.active_buy_order_l1: Optional[LimitOrder] = None
         self.active_sell_order_l1: Optional[LimitOrder] = None
@@ -121,13 +173,37 @@ class LimitOrderManager:
         self.active_buy_order_l2: Optional[LimitOrder] = None
         self.active_sell_order_l2: Optional[LimitOrder] = None
         
-        # 订单 ID 计数器
-        self._order_counter = int(time.time())
+        # 客户端订单 ID：进程号 + 启动时单调时钟作为前缀，重启后不会与旧订单 ID 冲突
+        self._clid_prefix = f"{os.getpid():x}{time.monotonic_ns():x}"[-CLIENT_ID_PREFIX_LEN:]
+        self._order_counter = 0
+        
+        # 订单状态查询线程池（各订单查询互不依赖，并发发出以重叠网络往返）
+        self._io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="order-io")
+        
+        # WebSocket 线程推送的订单状态事件 (ordId, state)，由策略线程取出
+        self._ws_events: "queue.SimpleQueue[Tuple[str, str]]" = queue.SimpleQueue()
+        # 已取出的最新订单状态 {ordId: state}（仅策略线程读写）
+        self._ws_order_states: Dict[str, str] = {}
+        # orders 频道是否可用
+        self._ws_orders_ready = False
+        # 每次（重新）订阅成功代数 +1；断线期间的推送可能丢失，需先用 REST 对账一次
+        self._ws_generation = 0
+        self._ws_synced_generation = 0
+        
+        # 持仓数量和平均成本缓存 (total_qty, avg_cost)，每次记录交易后失效
+        self._avg_cost_cache: Optional[Tuple[int, float]] = None
+        
+        # 私有 WebSocket 客户端（由主程序设置），已连接时通过长连接下单，省去 REST 往返
+        self.ws_client = None
+    
+    def close(self):
+        """关闭订单状态查询线程池（停止时调用）"""
+        self._io_pool.shutdown(wait=False)
     
     def _generate_client_order_id(self, side: str, level: int) -> str:
-        """生成客户端订单 ID"""
+        """生成客户端订单 ID（OKX 要求字母数字且不超过 32 位）"""
         self._order_counter += 1
-        return f"fib_{side}_L{level}_{self._order_counter}"
+        return f"fib{side[0]}{level}{self._clid_prefix}{self._order_counter:x}"
     
     def get_two_adjacent_fib_levels(
         self, 
@@ -145,37 +221,69 @@ class LimitOrderManager:
             (first_level, second_level)
             每个 level 是 (index, fib_level, fib_price, target_position) 或 None
         """
-        fib_levels = self.strategy.fib_levels
+        tick = round(current_price * PRICE_TICKS_PER_UNIT)
+        return self._adjacent_cache(tick, direction)
+    
+    def refresh_fib_levels(self):
+        """重新读取策略的斐波那契点位（点位重新生成后必须调用，会清空查询缓存）"""
+        # 斐波那契点位按价格升序排列，预先取出价格数组供二分查找
+        self._fib_prices = tuple(fib_price for _, fib_price, _ in self.strategy.fib_levels)
+        assert list(self._fib_prices) == sorted(self._fib_prices), "斐波那契点位必须按价格升序排列"
+        self._adjacent_cache.cache_clear()
+        # 点位变化后上次的挂单决策失效
+        self._last_noop_key = None
+        
+        # 每个点位四种随机偏移下的挂单价格表 {fib_price: (一级价格, 二级价格)}，挂单时按随机下标取用
+        self._buy_price_table = {
+            fib_price: tuple(
+                tuple(adjust_buy_price(fib_price, is_level2=is_level2, offset=o) for o in ALLOWED_OFFSETS)
+                for is_level2 in (False, True)
+            )
+            for _, fib_price, _ in self.strategy.fib_levels
+        }
+        self._sell_price_table = {
+            fib_price: tuple(
+                tuple(adjust_sell_price(fib_price, is_level2=is_level2, offset=o) for o in ALLOWED_OFFSETS)
+                for is_level2 in (False, True)
+            )
+            for _, fib_price, _ in self.strategy.fib_levels
+        }
+    
+    def price_bracket(self, price: float) -> Tuple[int, int]:
+        """
+        价格所在的点位区间 (bisect_left, bisect_right)
+        
+        与相邻点位查询使用相同的量化和边界规则：区间不变时，相邻点位和挂单价格都不变
+        """
+        tick_price = round(price * PRICE_TICKS_PER_UNIT) / PRICE_TICKS_PER_UNIT
+        return (
+            bisect.bisect_left(self._fib_prices, tick_price),
+            bisect.bisect_right(self._fib_prices, tick_price)
+        )
+    
+    def _adjacent_levels_for_tick(
+        self,
+        tick: int,
+        direction: str
+    ) -> Tuple[Optional[Tuple], Optional[Tuple]]:
+        """按量化价格计算相邻点位（由 _adjacent_cache 缓存）"""
+        current_price = tick / PRICE_TICKS_PER_UNIT
         
         if direction == "lower":
-            # 获取下方两个点位（用于买入）
-            lower_levels = []
-            for i, (level, fib_price, target_pos) in enumerate(fib_levels):
-                if fib_price < current_price:
-                    lower_levels.append((i, level, fib_price, target_pos))
-            
-            # 取最近的两个（倒序取最后两个）
-            if len(lower_levels) >= 2:
-                return lower_levels[-1], lower_levels[-2]
-            elif len(lower_levels) == 1:
-                return lower_levels[-1], None
-            else:
-                return None, None
+            # 获取下方两个点位（用于买入）：价格严格低于当前价的最近两个
+            i = bisect.bisect_left(self._fib_prices, current_price)
+            return self._fib_level_at(i - 1), self._fib_level_at(i - 2)
         
         else:  # direction == "upper"
-            # 获取上方两个点位（用于卖出）
-            upper_levels = []
-            for i, (level, fib_price, target_pos) in enumerate(fib_levels):
-                if fib_price > current_price:
-                    upper_levels.append((i, level, fib_price, target_pos))
-            
-            # 取最近的两个（正序取前两个）
-            if len(upper_levels) >= 2:
-                return upper_levels[0], upper_levels[1]
-            elif len(upper_levels) == 1:
-                return upper_levels[0], None
-            else:
-                return None, None
+            # 获取上方两个点位（用于卖出）：价格严格高于当前价的最近两个
+            i = bisect.bisect_right(self._fib_prices, current_price)
+            return self._fib_level_at(i), self._fib_level_at(i + 1)
+    
+    def _fib_level_at(self, index: int) -> Optional[Tuple]:
+        """按索引取点位 (index, fib_level, fib_price, target_position)，越界返回 None"""
+        if 0 <= index < len(self._fib_prices):
+            return (index, *self.strategy.fib_levels[index])
+        return None
     
     def calculate_order_quantity(
         self,
@@ -201,117 +309,6 @@ class LimitOrderManager:
             qty = current_position - target_position
             return max(0, qty)
     
-    def place_limit_buy_order(
-        self,
-        price: float,
-        quantity: int,
-        fib_level: float,
-        fib_price: float,
-        level: int = 1
-    ) -> Optional[LimitOrder]:
-        """
-        下买入限价单
-        """
-        if quantity <= 0:
-            self.logger.info(f"买入数量为 0，跳过挂单 (L{level})")
-            return None
-        
-        client_order_id = self._generate_client_order_id("buy", level)
-        
-        self.logger.info(f"下买入限价单 L{level}: 价格=${price:.1f}, 数量={quantity}, Fib={fib_level:.3f} @ ${fib_price:.2f}")
-        
-        try:
-            result = self.client.place_order(
-                inst_id=self.symbol,
-                td_mode="cross",
-                side="buy",
-                order_type="limit",
-                sz=str(quantity),
-                px=str(price)
-            )
-            
-            if result.get("code") == "0" and result.get("data"):
-                order_id = result["data"][0].get("ordId", "")
-                
-                order = LimitOrder(
-                    order_id=order_id,
-                    client_order_id=client_order_id,
-                    side="buy",
-                    price=price,
-                    quantity=quantity,
-                    fib_level=fib_level,
-                    fib_price=fib_price,
-                    level=level,
-                    status="live"
-                )
-                
-                self.logger.info(f"买入限价单 L{level} 已挂: ordId={order_id}, 价格=${price:.1f}")
-                return order
-            else:
-                error_msg = result.get("msg", "未知错误")
-                self.logger.error(f"买入限价单 L{level} 失败: {error_msg}")
-                return None
-                
-        except Exception as e:
-            self.logger.error(f"下买入限价单 L{level} 异常: {e}")
-            return None
-    
-    def place_limit_sell_order(
-        self,
-        price: float,
-        quantity: int,
-        fib_level: float,
-        fib_price: float,
-        level: int = 1
-    ) -> Optional[LimitOrder]:
-        """
-        下卖出限价单
-        """
-        if quantity <= 0:
-            self.logger.info(f"卖出数量为 0，跳过挂单 (L{level})")
-            return None
-        
-        client_order_id = self._generate_client_order_id("sell", level)
-        
-        self.logger.info(f"下卖出限价单 L{level}: 价格=${price:.1f}, 数量={quantity}, Fib={fib_level:.3f} @ ${fib_price:.2f}")
-        
-        try:
-            result = self.client.place_order(
-                inst_id=self.symbol,
-                td_mode="cross",
-                side="sell",
-                order_type="limit",
-                sz=str(quantity),
-                px=str(price),
-                reduce_only=True
-            )
-            
-            if result.get("code") == "0" and result.get("data"):
-                order_id = result["data"][0].get("ordId", "")
-                
-                order = LimitOrder(
-                    order_id=order_id,
-                    client_order_id=client_order_id,
-                    side="sell",
-                    price=price,
-                    quantity=quantity,
-                    fib_level=fib_level,
-                    fib_price=fib_price,
-                    level=level,
-                    status="live"
-                )
-                
-                self.logger.info(f"卖出限价单 L{level} 已挂: ordId={order_id}, 价格=${price:.1f}")
-                return order
-            else:
-                error_msg = result.get("msg", "未知错误")
-                self.logger.error(f"卖出限价单 L{level} 失败: {error_msg}")
-                return None
-                
-        except Exception as e:
-            self.logger.error(f"下卖出限价单 L{level} 异常: {e}")
-            return None
-    
     def cancel_order(self, order: LimitOrder) -> bool:
         """撤销订单"""
         if not order or order.status != "live":
@@ -325,25 +322,65 @@ class LimitOrderManager:
             
             if result.get("code") == "0":
                 order.status = "canceled"
-                self.logger.info(f"订单已撤销: {order.side} L{order.level} ordId={order.order_id}")
+                self.logger.info("订单已撤销: %s L%s ordId=%s", order.side, order.level, order.order_id)
                 return True
             else:
                 error_msg = result.get("msg", "未知错误")
                 if "Order does not exist" in error_msg or "51400" in str(result.get("code", "")):
-                    self.logger.warning(f"订单不存在，可能已成交: {order.order_id}")
+                    self.logger.warning("订单不存在，可能已成交: %s", order.order_id)
                     return True
-                self.logger.error(f"撤单失败: {error_msg}")
+                self.logger.error("撤单失败: %s", error_msg)
                 return False
                 
         except Exception as e:
-            self.logger.error(f"撤单异常: {e}")
+            self.logger.error("撤单异常: %s", e)
             return False
     
+    # ==================== WebSocket orders 频道 ====================
+    
+    def on_ws_connected(self):
+        """orders 频道（重新）订阅成功"""
+        self._ws_generation += 1
+        self._ws_orders_ready = True
+        self.logger.info("订单推送已就绪，下一轮先用 REST 对账")
+    
+    def on_ws_disconnected(self):
+        """orders 频道断开，回退 REST 查询"""
+        self._ws_orders_ready = False
+        self.logger.warning("订单推送断开，回退 REST 查询订单状态")
+    
+    def on_ws_orders(self, data: List[Dict]):
+        """orders 频道推送回调（在 WebSocket 线程中执行）"""
+        for item in data:
+            if item.get("instId") != self.symbol:
+                continue
+            order_id = item.get("ordId")
+            state = item.get("state")
+            if order_id and state:
+                self._ws_events.put_nowait((order_id, state))
+    
+    def _drain_ws_events(self):
+        """取出 WebSocket 线程积压的订单状态事件，按到达顺序更新最新状态"""
+        while True:
+            try:
+                order_id, state = self._ws_events.get_nowait()
+            except queue.Empty:
+                break
+            self._ws_order_states[order_id] = state
+    
+    def _use_ws_order_states(self) -> bool:
+        """推送可用且重连后已完成 REST 对账"""
+        return self._ws_orders_ready and self._ws_synced_generation == self._ws_generation
+    
     def check_order_status(self, order: LimitOrder) -> str:
-        """检查订单状态"""
+        """检查订单状态（优先使用 WebSocket 推送，否则 REST 查询）"""
         if not order:
             return "none"
         
+        if self._use_ws_order_states():
+            # 尚未收到推送的订单为刚挂出的订单
+            return self._ws_order_states.get(order.order_id, "live")
+        
         try:
             result = self.client.get_order(
                 inst_id=self.symbol,
@@ -358,176 +395,359 @@ class LimitOrderManager:
                 return "unknown"
                 
         except Exception as e:
-            self.logger.error(f"查询订单状态异常: {e}")
+            self.logger.error("查询订单状态异常: %s", e)
             return "error"
     
+    def fetch_order_statuses(self, orders: List[LimitOrder]) -> Dict[str, str]:
+        """
+        并发查询多个订单状态
+        
+        Returns:
+            {order_id: state}
+        """
+        self._drain_ws_events()
+        # 推送状态直接读内存，只有 REST 查询才交给线程池并发
+        if len(orders) <= 1 or self._use_ws_order_states():
+            return {order.order_id: self.check_order_status(order) for order in orders}
+        
+        states = self._io_pool.map(self.check_order_status, orders)
+        return {order.order_id: state for order, state in zip(orders, states)}
+    
     def update_orders(
         self,
         current_price: float,
         current_position: int
-    ) -> Dict:
+    ) -> Mapping:
         """
         更新限价单（一级和二级）
         
         一级单：相邻斐波那契点位
         二级单：下一个斐波那契点位 ± 1U
-        """
-        result = {
-            "buy_orders": [],
-            "sell_orders": [],
-            "filled_orders": [],
-            "canceled_orders": []
-        }
         
+        先遍历四个挂单槽位规划需要撤销和新挂的订单，
+        再通过一次批量撤单 + 一次批量下单提交，减少 REST 往返次数
+        
+        Returns:
+            本轮挂出/撤销的订单；无改动时返回共享的只读 EMPTY_UPDATE_RESULT
+        """
         # 检查价格是否在范围内
         if not self.strategy.is_price_in_range(current_price):
-            self.logger.info(f"价格 ${current_price:.2f} 超出范围，取消所有挂单")
+            self.logger.info("价格 $%.2f 超出范围，取消所有挂单", current_price)
             self._cancel_all_orders()
-            return result
+            return EMPTY_UPDATE_RESULT
         
-        self.logger.info(f"当前价格: ${current_price:.2f}, 持仓: {current_position}")
-        
-        # ========== 处理买入限价单 ==========
         lower_l1, lower_l2 = self.get_two_adjacent_fib_levels(current_price, "lower")
+        upper_l1, upper_l2 = self.get_two_adjacent_fib_levels(current_price, "upper")
         
+        # 挂单决策只取决于所处点位区间、持仓和当前挂单；与上次无变化时直接返回
+        noop_key = (
+            lower_l1 and lower_l1[0],
+            upper_l1 and upper_l1[0],
+            current_position,
+            self.active_buy_order_l1 and self.active_buy_order_l1.order_id,
+            self.active_buy_order_l2 and self.active_buy_order_l2.order_id,
+            self.active_sell_order_l1 and self.active_sell_order_l1.order_id,
+            self.active_sell_order_l2 and self.active_sell_order_l2.order_id
+        )
+        if noop_key == self._last_noop_key:
+            return EMPTY_UPDATE_RESULT
+        
+        self.logger.info("当前价格: $%.2f, 持仓: %s", current_price, current_position)
+        
+        to_cancel: List[LimitOrder] = []
+        to_place: List[Tuple[str, LimitOrder]] = []
+        # 本轮新建订单共用同一创建时间
+        now = datetime.now()
+        
+        # ========== 处理买入限价单 ==========
         if lower_l1:
-            self.logger.info(f"  下方L1点位: Fib {lower_l1[1]:.3f} @ ${lower_l1[2]:.2f}, 目标 {lower_l1[3]} 张")
+            self.logger.info("  下方L1点位: Fib %.3f @ $%.2f, 目标 %s 张", lower_l1[1], lower_l1[2], lower_l1[3])
         if lower_l2:
-            self.logger.info(f"  下方L2点位: Fib {lower_l2[1]:.3f} @ ${lower_l2[2]:.2f}, 目标 {lower_l2[3]} 张")
+            self.logger.info("  下方L2点位: Fib %.3f @ $%.2f, 目标 %s 张", lower_l2[1], lower_l2[2], lower_l2[3])
         
         # 一级买入单
+        buy_qty_l1 = 0
         if lower_l1:
-            _, fib_level, fib_price, target_pos = lower_l1
-            buy_qty = self.calculate_order_quantity(current_position, target_pos, "buy")
-            
-            if buy_qty > 0:
-                need_new = self._should_update_order(self.active_buy_order_l1, fib_level, buy_qty)
-                
-                if need_new:
-                    if self.active_buy_order_l1:
-                        self.cancel_order(self.active_buy_order_l1)
-                        result["canceled_orders"].append(self.active_buy_order_l1)
-                    
-                    buy_price = adjust_buy_price(fib_price, is_level2=False)
-                    new_order = self.place_limit_buy_order(buy_price, buy_qty, fib_level, fib_price, level=1)
-                    if new_order:
-                        self.active_buy_order_l1 = new_order
-                        result["buy_orders"].append(new_order)
-            else:
-                if self.active_buy_order_l1:
-                    self.cancel_order(self.active_buy_order_l1)
-                    result["canceled_orders"].append(self.active_buy_order_l1)
-                    self.active_buy_order_l1 = None
-        else:
-            if self.active_buy_order_l1:
-                self.cancel_order(self.active_buy_order_l1)
-                result["canceled_orders"].append(self.active_buy_order_l1)
-                self.active_buy_order_l1 = None
+            buy_qty_l1 = self.calculate_order_quantity(current_position, lower_l1[3], "buy")
+        self._plan_order("active_buy_order_l1", "buy", 1, lower_l1, buy_qty_l1, to_cancel, to_place, now)
         
         # 二级买入单（下一个斛波那契点位，额外 -1U）
+        # 二级单数量：从 L1 目标持仓到 L2 目标持仓的差值
+        buy_qty_l2 = 0
         if lower_l2 and lower_l1:
-            _, fib_level, fib_price, target_pos_l2 = lower_l2
-            _, _, _, target_pos_l1 = lower_l1
-            # 二级单数量：从 L1 目标持仓到 L2 目标持仓的差值
-            buy_qty = target_pos_l2 - target_pos_l1
-            buy_qty = max(0, buy_qty)
-            
-            if buy_qty > 0:
-                need_new = self._should_update_order(self.active_buy_order_l2, fib_level, buy_qty)
-                
-                if need_new:
-                    if self.active_buy_order_l2:
-                        self.cancel_order(self.active_buy_order_l2)
-                        result["canceled_orders"].append(self.active_buy_order_l2)
-                    
-                    # 二级单：随机偏移后再 -1U
-                    buy_price = adjust_buy_price(fib_price, is_level2=True)
-                    new_order = self.place_limit_buy_order(buy_price, buy_qty, fib_level, fib_price, level=2)
-                    if new_order:
-                        self.active_buy_order_l2 = new_order
-                        result["buy_orders"].append(new_order)
-            else:
-                if self.active_buy_order_l2:
-                    self.cancel_order(self.active_buy_order_l2)
-                    result["canceled_orders"].append(self.active_buy_order_l2)
-                    self.active_buy_order_l2 = None
-        else:
-            if self.active_buy_order_l2:
-                self.cancel_order(self.active_buy_order_l2)
-                result["canceled_orders"].append(self.active_buy_order_l2)
-                self.active_buy_order_l2 = None
+            buy_qty_l2 = max(0, lower_l2[3] - lower_l1[3])
+        self._plan_order("active_buy_order_l2", "buy", 2, lower_l2, buy_qty_l2, to_cancel, to_place, now)
         
         # ========== 处理卖出限价单 ==========
-        upper_l1, upper_l2 = self.get_two_adjacent_fib_levels(current_price, "upper")
-        
         if upper_l1:
-            self.logger.info(f"  上方L1点位: Fib {upper_l1[1]:.3f} @ ${upper_l1[2]:.2f}, 目标 {upper_l1[3]} 张")
+            self.logger.info("  上方L1点位: Fib %.3f @ $%.2f, 目标 %s 张", upper_l1[1], upper_l1[2], upper_l1[3])
         if upper_l2:
-            self.logger.info(f"  上方L2点位: Fib {upper_l2[1]:.3f} @ ${upper_l2[2]:.2f}, 目标 {upper_l2[3]} 张")
+            self.logger.info("  上方L2点位: Fib %.3f @ $%.2f, 目标 %s 张", upper_l2[1], upper_l2[2], upper_l2[3])
         
         # 一级卖出单
+        sell_qty_l1 = 0
         if upper_l1 and current_position > 0:
-            _, fib_level, fib_price, target_pos = upper_l1
-            sell_qty = self.calculate_order_quantity(current_position, target_pos, "sell")
-            
-            if sell_qty > 0:
-                need_new = self._should_update_order(self.active_sell_order_l1, fib_level, sell_qty)
-                
-                if need_new:
-                    if self.active_sell_order_l1:
-                        self.cancel_order(self.active_sell_order_l1)
-                        result["canceled_orders"].append(self.active_sell_order_l1)
-                    
-                    sell_price = adjust_sell_price(fib_price, is_level2=False)
-                    new_order = self.place_limit_sell_order(sell_price, sell_qty, fib_level, fib_price, level=1)
-                    if new_order:
-                        self.active_sell_order_l1 = new_order
-                        result["sell_orders"].append(new_order)
-            else:
-                if self.active_sell_order_l1:
-                    self.cancel_order(self.active_sell_order_l1)
-                    result["canceled_orders"].append(self.active_sell_order_l1)
-                    self.active_sell_order_l1 = None
-        else:
-            if self.active_sell_order_l1:
-                self.cancel_order(self.active_sell_order_l1)
-                result["canceled_orders"].append(self.active_sell_order_l1)
-                self.active_sell_order_l1 = None
+            sell_qty_l1 = self.calculate_order_quantity(current_position, upper_l1[3], "sell")
+        self._plan_order("active_sell_order_l1", "sell", 1, upper_l1, sell_qty_l1, to_cancel, to_place, now)
         
         # 二级卖出单（下一个斛波那契点位，额外 +1U）
+        # 二级单数量：从 L1 目标持仓到 L2 目标持仓的差值
+        sell_qty_l2 = 0
         if upper_l2 and upper_l1 and current_position > 0:
-            _, fib_level, fib_price, target_pos_l2 = upper_l2
-            _, _, _, target_pos_l1 = upper_l1
-            # 二级单数量：从 L1 目标持仓到 L2 目标持仓的差值
-            sell_qty = target_pos_l1 - target_pos_l2
-            sell_qty = max(0, sell_qty)
+            sell_qty_l2 = max(0, upper_l1[3] - upper_l2[3])
+        self._plan_order("active_sell_order_l2", "sell", 2, upper_l2, sell_qty_l2, to_cancel, to_place, now)
+        
+        # ========== 批量提交 ==========
+        # 本轮未做任何改动时记住决策键，之后相同行情直接跳过
+        if not (to_cancel or to_place):
+            self._last_noop_key = noop_key
+            return EMPTY_UPDATE_RESULT
+        self._last_noop_key = None
+        
+        result = {
+            "buy_orders": [],
+            "sell_orders": [],
+            "filled_orders": [],
+            "canceled_orders": []
+        }
+        
+        # 先撤后挂：只减仓卖单需要先释放旧单占用的持仓
+        if to_cancel:
+            self.cancel_orders(to_cancel)
+            result["canceled_orders"].extend(to_cancel)
+        
+        if to_place:
+            self.place_limit_orders([order for _, order in to_place])
+            for slot, order in to_place:
+                if not order.order_id:
+                    continue
+                setattr(self, slot, order)
+                if order.side == "buy":
+                    result["buy_orders"].append(order)
+                else:
+                    result["sell_orders"].append(order)
+        
+        return result
+    
+    def _plan_order(
+        self,
+        slot: str,
+        side: str,
+        level: int,
+        fib_target: Optional[Tuple],
+        quantity: int,
+        to_cancel: List[LimitOrder],
+        to_place: List[Tuple[str, LimitOrder]],
+        created_at: datetime
+    ):
+        """
+        规划单个挂单槽位：保持不动 / 撤单 / 撤单后重挂
+        
+        Args:
+            slot: 槽位属性名，如 "active_buy_order_l1"
+            side: buy / sell
+            level: 订单级别 (1 或 2)
+            fib_target: 目标斐波那契点位 (index, fib_level, fib_price, target_position) 或 None
+            quantity: 挂单数量，<= 0 表示该槽位不需要挂单
+            to_cancel: 待撤销订单列表（原地追加）
+            to_place: 待挂订单列表 [(slot, LimitOrder)]（原地追加）
+            created_at: 新订单创建时间
+        """
+        active = getattr(self, slot)
+        
+        if not fib_target or quantity <= 0:
+            if active:
+                to_cancel.append(active)
+                setattr(self, slot, None)
+            return
+        
+        _, fib_level, fib_price, _ = fib_target
+        if not self._should_update_order(active, fib_level, quantity):
+            return
+        
+        if active:
+            to_cancel.append(active)
+            setattr(self, slot, None)
+        
+        price_table = self._buy_price_table if side == "buy" else self._sell_price_table
+        price = price_table[fib_price][level - 1][_randbits(OFFSET_INDEX_BITS)]
+        
+        order = LimitOrder(
+            order_id="",
+            client_order_id=self._generate_client_order_id(side, level),
+            side=side,
+            price=price,
+            quantity=quantity,
+            fib_level=fib_level,
+            fib_price=fib_price,
+            level=level,
+            status="live",
+            created_at=created_at
+        )
+        to_place.append((slot, order))
+    
+    def place_limit_orders(self, orders: List[LimitOrder]) -> List[LimitOrder]:
+        """
+        批量下限价单
+        
+        成功的订单会被原地写入 order_id，失败的订单 order_id 保持为空
+        
+        Returns:
+            下单成功的订单列表
+        """
+        placed = []
+        if not orders:
+            return placed
+        
+        payloads = []
+        for order in orders:
+            self.logger.info(
+                "下%s限价单 L%s: 价格=$%.1f, 数量=%s, Fib=%.3f @ $%.2f",
+                "买入" if order.side == "buy" else "卖出", order.level,
+                order.price, order.quantity, order.fib_level, order.fib_price
+            )
+            payloads.append(self._build_limit_order(
+                side=order.side,
+                sz=str(order.quantity),
+                px=str(order.price),
+                reduce_only=order.side == "sell",
+                cl_ord_id=order.client_order_id
+            ))
+        
+        try:
+            result = self._submit_batch_orders(payloads)
+        except Exception as e:
+            self.logger.error("批量下单异常: %s", e)
+            return placed
+        
+        data = result.get("data") or []
+        if len(data) != len(orders):
+            self.logger.error("批量下单失败: %s", result.get('msg', '未知错误'))
+            return placed
+        
+        # 批量接口按请求顺序返回每个订单的结果
+        for order, item in zip(orders, data):
+            side_cn = "买入" if order.side == "buy" else "卖出"
+            if item.get("sCode") == "0":
+                order.order_id = item.get("ordId", "")
+                placed.append(order)
+                self.logger.info("%s限价单 L%s 已挂: ordId=%s, 价格=$%.1f", side_cn, order.level, order.order_id, order.price)
+            else:
+                self.logger.error("%s限价单 L%s 失败: %s", side_cn, order.level, item.get('sMsg', '未知错误'))
+        
+        return placed
+    
+    def _submit_batch_orders(self, payloads: List[Dict]) -> Dict:
+        """
+        提交批量下单请求：优先走私有 WebSocket，连接不可用时回退 REST
+        
+        WebSocket 请求已发出但超时（或等待期间断线）时结果未知，不重新下单，
+        而是按 clOrdId 逐个查询实际结果
+        """
+        if self.ws_client is not None:
+            try:
+                return self.ws_client.request("batch-orders", payloads)
+            except ConnectionError as e:
+                self.logger.warning("WebSocket 下单不可用，改用 REST: %s", e)
+            except TimeoutError as e:
+                self.logger.error("WebSocket 批量下单结果未知，按 clOrdId 查询: %s", e)
+                return self._resolve_unknown_batch(payloads)
+        return self.client.place_batch_orders(payloads)
+    
+    def _resolve_unknown_batch(self, payloads: List[Dict]) -> Dict:
+        """
+        查询结果未知的批量下单，构造与批量下单接口相同格式的响应
+        
+        交易所已接受的订单（含已成交）返回 sCode="0" 和 ordId，由调用方接管；
+        确认不存在或已撤销的订单视为下单失败；查询失败的订单按 clOrdId 撤销，避免遗留无人跟踪的挂单
+        """
+        data = []
+        for payload in payloads:
+            cl_ord_id = payload.get("clOrdId")
+            try:
+                result = self.client.get_order(inst_id=self.symbol, cl_ord_id=cl_ord_id)
+            except Exception as e:
+                result = {"code": "-1", "msg": str(e)}
             
-            if sell_qty > 0:
-                need_new = self._should_update_order(self.active_sell_order_l2, fib_level, sell_qty)
-                
-                if need_new:
-                    if self.active_sell_order_l2:
-                        self.cancel_order(self.active_sell_order_l2)
-                        result["canceled_orders"].append(self.active_sell_order_l2)
-                    
-                    # 二级单：随机偏移后再 +1U
-                    sell_price = adjust_sell_price(fib_price, is_level2=True)
-                    new_order = self.place_limit_sell_order(sell_price, sell_qty, fib_level, fib_price, level=2)
-                    if new_order:
-                        self.active_sell_order_l2 = new_order
-                        result["sell_orders"].append(new_order)
+            if result.get("code") == "0" and result.get("data"):
+                order_data = result["data"][0]
+                state = order_data.get("state", "")
+                if state in ("live", "partially_filled", "filled"):
+                    self.logger.warning("订单已被交易所接受，接管: clOrdId=%s, ordId=%s, 状态=%s",
+                                        cl_ord_id, order_data.get("ordId"), state)
+                    data.append({"sCode": "0", "ordId": order_data.get("ordId", ""), "clOrdId": cl_ord_id})
+                else:
+                    data.append({"sCode": "-1", "sMsg": f"订单状态 {state}", "clOrdId": cl_ord_id})
+            elif result.get("code") == ORDER_NOT_EXIST_CODE:
+                data.append({"sCode": ORDER_NOT_EXIST_CODE, "sMsg": "订单不存在", "clOrdId": cl_ord_id})
             else:
-                if self.active_sell_order_l2:
-                    self.cancel_order(self.active_sell_order_l2)
-                    result["canceled_orders"].append(self.active_sell_order_l2)
-                    self.active_sell_order_l2 = None
-        else:
-            if self.active_sell_order_l2:
-                self.cancel_order(self.active_sell_order_l2)
-                result["canceled_orders"].append(self.active_sell_order_l2)
-                self.active_sell_order_l2 = None
+                self.logger.error("查询订单失败，按 clOrdId 撤单: %s, %s", cl_ord_id, result.get("msg", "未知错误"))
+                try:
+                    self.client.cancel_order(inst_id=self.symbol, cl_ord_id=cl_ord_id)
+                except Exception as e:
+                    self.logger.error("撤单异常: clOrdId=%s, %s", cl_ord_id, e)
+                data.append({"sCode": "-1", "sMsg": "下单结果未知，已尝试撤单", "clOrdId": cl_ord_id})
         
-        return result
+        return {"code": "0", "data": data}
+    
+    def cancel_orders(self, orders: List[LimitOrder]) -> bool:
+        """
+        批量撤销订单
+        
+        Returns:
+            是否全部撤销成功（订单已不存在视为成功）
+        """
+        live_orders = [order for order in orders if order and order.status == "live"]
+        if not live_orders:
+            return True
+        if len(live_orders) == 1:
+            return self.cancel_order(live_orders[0])
+        
+        codes = self._cancel_order_ids([order.order_id for order in live_orders])
+        
+        all_ok = True
+        for order in live_orders:
+            s_code = codes.get(order.order_id)
+            if s_code == "0":
+                order.status = "canceled"
+                self.logger.info("订单已撤销: %s L%s ordId=%s", order.side, order.level, order.order_id)
+            elif s_code == "51400":
+                self.logger.warning("订单不存在，可能已成交: %s", order.order_id)
+            else:
+                all_ok = False
+        
+        return all_ok
+    
+    def _cancel_order_ids(self, order_ids: List[str]) -> Dict[str, str]:
+        """
+        按 ordId 批量撤单（每批最多 CANCEL_BATCH_SIZE 个）
+        
+        Returns:
+            {ordId: sCode}，请求失败的订单不在结果中
+        """
+        codes: Dict[str, str] = {}
+        for start in range(0, len(order_ids), CANCEL_BATCH_SIZE):
+            batch = order_ids[start:start + CANCEL_BATCH_SIZE]
+            try:
+                result = self.client.cancel_batch_orders(
+                    [{"instId": self.symbol, "ordId": order_id} for order_id in batch]
+                )
+            except Exception as e:
+                self.logger.error("批量撤单异常: %s", e)
+                continue
+            
+            data = result.get("data") or []
+            if len(data) != len(batch):
+                self.logger.error("批量撤单失败: %s", result.get('msg', '未知错误'))
+                continue
+            
+            for order_id, item in zip(batch, data):
+                s_code = str(item.get("sCode", ""))
+                codes[order_id] = s_code
+                if s_code not in ("0", "51400"):
+                    self.logger.error("撤单失败: ordId=%s, %s", order_id, item.get('sMsg', '未知错误'))
+        
+        return codes
     
     def _should_update_order(
         self,
@@ -535,34 +755,34 @@ class LimitOrderManager:
         new_fib_level: float,
         new_qty: int
     ) -> bool:
-        """检查是否需要更新订单"""
-        if not order:
-            return True
-        
-        # 如果斐波那契级别变了，需要更新
-        if abs(order.fib_level - new_fib_level) > 0.001:
-            return True
-        
-        # 如果数量变了，需要更新
-        if order.quantity != new_qty:
-            return True
-        
-        return False
+        """检查是否需要更新订单：无挂单、斐波那契级别变化或数量变化"""
+        return (
+            order is None
+            or abs(order.fib_level - new_fib_level) > 0.001
+            or order.quantity != new_qty
+        )
     
     def _cancel_all_orders(self):
-        """取消所有活跃订单"""
-        if self.active_buy_order_l1:
-            self.cancel_order(self.active_buy_order_l1)
-            self.active_buy_order_l1 = None
-        if self.active_buy_order_l2:
-            self.cancel_order(self.active_buy_order_l2)
-            self.active_buy_order_l2 = None
-        if self.active_sell_order_l1:
-            self.cancel_order(self.active_sell_order_l1)
-            self.active_sell_order_l1 = None
-        if self.active_sell_order_l2:
-            self.cancel_order(self.active_sell_order_l2)
-            self.active_sell_order_l2 = None
+        """取消所有活跃订单（一次批量撤单）"""
+        self.cancel_orders([
+            self.active_buy_order_l1,
+            self.active_buy_order_l2,
+            self.active_sell_order_l1,
+            self.active_sell_order_l2
+        ])
+        self.active_buy_order_l1 = None
+        self.active_buy_order_l2 = None
+        self.active_sell_order_l1 = None
+        self.active_sell_order_l2 = None
+    
+    def active_orders(self) -> List[LimitOrder]:
+        """当前所有活跃挂单（一级、二级买卖单）"""
+        return [
+            order for order in (
+                self.active_buy_order_l1, self.active_buy_order_l2,
+                self.active_sell_order_l1, self.active_sell_order_l2
+            ) if order
+        ]
     
     def check_filled_orders(self, current_position: int) -> List[LimitOrder]:
         """
@@ -573,12 +793,28 @@ class LimitOrderManager:
         """
         filled_orders = []
         
+        # 一次性并发查询所有活跃订单的状态
+        active_orders = self.active_orders()
+        generation = self._ws_generation
+        statuses = self.fetch_order_statuses(active_orders)
+        # 本轮状态已是权威结果（REST 对账或推送），之后可直接使用推送状态
+        self._ws_synced_generation = generation
+        
+        # 只保留活跃订单的推送状态
+        active_ids = {order.order_id for order in active_orders}
+        for order_id in list(self._ws_order_states):
+            if order_id not in active_ids:
+                self._ws_order_states.pop(order_id, None)
+        
+        # 本轮成交订单共用同一成交时间
+        now = datetime.now()
+        
         # 检查一级买入订单
         if self.active_buy_order_l1:
-            status = self.check_order_status(self.active_buy_order_l1)
+            status = statuses.get(self.active_buy_order_l1.order_id)
             if status == "filled":
                 self.active_buy_order_l1.status = "filled"
-                self.active_buy_order_l1.filled_at = datetime.now()
+                self.active_buy_order_l1.filled_at = now
                 filled_orders.append(self.active_buy_order_l1)
                 
                 self._notify_order_filled(self.active_buy_order_l1, current_position)
@@ -592,10 +828,10 @@ class LimitOrderManager:
         
         # 检查二级买入订单
         if self.active_buy_order_l2:
-            status = self.check_order_status(self.active_buy_order_l2)
+            status = statuses.get(self.active_buy_order_l2.order_id)
             if status == "filled":
                 self.active_buy_order_l2.status = "filled"
-                self.active_buy_order_l2.filled_at = datetime.now()
+                self.active_buy_order_l2.filled_at = now
                 filled_orders.append(self.active_buy_order_l2)
                 
                 self._notify_order_filled(self.active_buy_order_l2, current_position)
@@ -606,10 +842,10 @@ class LimitOrderManager:
         
         # 检查一级卖出订单
         if self.active_sell_order_l1:
-            status = self.check_order_status(self.active_sell_order_l1)
+            status = statuses.get(self.active_sell_order_l1.order_id)
             if status == "filled":
                 self.active_sell_order_l1.status = "filled"
-                self.active_sell_order_l1.filled_at = datetime.now()
+                self.active_sell_order_l1.filled_at = now
                 filled_orders.append(self.active_sell_order_l1)
                 
                 self._notify_order_filled(self.active_sell_order_l1, current_position)
@@ -623,10 +859,10 @@ class LimitOrderManager:
         
         # 检查二级卖出订单
         if self.active_sell_order_l2:
-            status = self.check_order_status(self.active_sell_order_l2)
+            status = statuses.get(self.active_sell_order_l2.order_id)
             if status == "filled":
                 self.active_sell_order_l2.status = "filled"
-                self.active_sell_order_l2.filled_at = datetime.now()
+                self.active_sell_order_l2.filled_at = now
                 filled_orders.append(self.active_sell_order_l2)
                 
                 self._notify_order_filled(self.active_sell_order_l2, current_position)
@@ -670,7 +906,7 @@ class LimitOrderManager:
                 )
                 
         except Exception as e:
-            self.logger.error(f"发送通知失败: {e}")
+            self.logger.error("发送通知失败: %s", e)
     
     def _calculate_profit(self, order: LimitOrder) -> float:
         """计算卖出利润"""
@@ -678,12 +914,14 @@ class LimitOrderManager:
             return 0.0
         
         try:
-            total_qty, avg_cost = self.db.get_total_position(self.symbol)
+            if self._avg_cost_cache is None:
+                self._avg_cost_cache = self.db.get_total_position(self.symbol)
+            total_qty, avg_cost = self._avg_cost_cache
             if avg_cost and avg_cost > 0:
                 profit = (order.price - avg_cost) * order.quantity
                 return round(profit, 2)
         except Exception as e:
-            self.logger.error(f"计算利润失败: {e}")
+            self.logger.error("计算利润失败: %s", e)
         
         return 0.0
     
@@ -709,27 +947,24 @@ class LimitOrderManager:
                     direction="LONG"
                 )
         except Exception as e:
-            self.logger.error(f"记录交易失败: {e}")
+            self.logger.error("记录交易失败: %s", e)
+        finally:
+            self.invalidate_cost_cache()
+    
+    def invalidate_cost_cache(self):
+        """持仓批次变化后清除平均成本缓存（外部直接写数据库时也需调用）"""
+        self._avg_cost_cache = None
     
     def get_status(self) -> Dict:
         """获取限价单管理器状态"""
-        def order_info(order):
-            if not order:
-                return None
-            return {
-                "order_id": order.order_id,
-                "price": order.price,
-                "quantity": order.quantity,
-                "fib_level": order.fib_level,
-                "fib_price": order.fib_price,
-                "level": order.level
-            }
-        
         return {
-            "buy_order_l1": order_info(self.active_buy_order_l1),
-            "buy_order_l2": order_info(self.active_buy_order_l2),
-            "sell_order_l1": order_info(self.active_sell_order_l1),
-            "sell_order_l2": order_info(self.active_sell_order_l2)
+            key: None if order is None else {name: getattr(order, name) for name in STATUS_FIELDS}
+            for key, order in (
+                ("buy_order_l1", self.active_buy_order_l1),
+                ("buy_order_l2", self.active_buy_order_l2),
+                ("sell_order_l1", self.active_sell_order_l1),
+                ("sell_order_l2", self.active_sell_order_l2),
+            )
         }
     
     def sync_with_exchange(self):
@@ -739,7 +974,7 @@ class LimitOrderManager:
             
             if result.get("code") == "0" and result.get("data"):
                 pending_orders = result["data"]
-                self.logger.info(f"发现 {len(pending_orders)} 个未完成订单")
+                self.logger.info("发现 %s 个未完成订单", len(pending_orders))
                 
                 for order_data in pending_orders:
                     side = order_data.get("side", "")
@@ -747,14 +982,17 @@ class LimitOrderManager:
                     price = float(order_data.get("px", 0))
                     qty = int(float(order_data.get("sz", 0)))
                     
-                    self.logger.info(f"  {side} ordId={order_id}, 价格=${price:.1f}, 数量={qty}")
-                    self.client.cancel_order(inst_id=self.symbol, ord_id=order_id)
-                    self.logger.info(f"  已取消旧订单: {order_id}")
+                    self.logger.info("  %s ordId=%s, 价格=$%.1f, 数量=%s", side, order_id, price, qty)
+                
+                codes = self._cancel_order_ids([order_data.get("ordId", "") for order_data in pending_orders])
+                for order_id, s_code in codes.items():
+                    if s_code == "0":
+                        self.logger.info("  已取消旧订单: %s", order_id)
             else:
                 self.logger.info("没有未完成的订单")
                 
         except Exception as e:
-            self.logger.error(f"同步订单状态失败: {e}")
+            self.logger.error("同步订单状态失败: %s", e)
 
 
 # 测试代码
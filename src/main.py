@@ -5,11 +5,16 @@ OKX SOL 全仓合约交易机器人
 import os
 import sys
 import time
+import queue
+import atexit
 import signal
 import logging
+import logging.handlers
+import threading
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import TYPE_CHECKING, Optional, Dict, List, Tuple
 
 # 添加当前目录到路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -28,13 +33,52 @@ from limit_order_manager import (
 from telegram_notifier import TelegramNotifier
 from database import TradingDatabase, SellResult
 
+if TYPE_CHECKING:
+    from okx_ws import OKXWebSocketClient
+
+# 单调时钟（纳秒），用于缓存过期和轮询间隔计算，不受系统校时影响
+_now_ns = time.monotonic_ns
+
+# LOG_LEVEL 配置值 -> logging 级别
+_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL,
+}
+
+
+class PositionUnavailable(Exception):
+    """持仓查询失败（与空仓区分，调用方不能当作 0 持仓处理）"""
+
 
 class TradingBot:
     """交易机器人主类"""
     
+    # 价格距离最近挂单在此比例以内时加快轮询
+    NEAR_ORDER_RATIO = 0.003
+    # 接近挂单时的轮询间隔（秒）
+    FAST_CHECK_INTERVAL = 1.0
+    # 轮询间隔下限（秒），每轮约 6 次 REST 请求，远低于 OKX 各接口限速
+    MIN_CHECK_INTERVAL = 0.5
+    # 价格超出交易范围（无挂单）时的轮询间隔倍数
+    IDLE_INTERVAL_FACTOR = 3
+    # 行情查询失败时沿用上次价格的最长时间（秒）
+    STALE_PRICE_LIMIT = 10
+    # 初始化市价单提交后等待持仓反映的最长时间（秒），期间不再重复买入
+    MARKET_ORDER_SETTLE_TIME = 10
+    # 推送价格超过该时间（秒）未更新时视为过期，回退 REST 查询
+    WS_PRICE_MAX_AGE = 5
+    # 持仓推送超过该时间（秒）无更新时用 REST 核对一次，防止漏收推送导致持仓长期偏差
+    POSITION_RECONCILE_INTERVAL = 60
+    
     def __init__(self, config: AppConfig):
         self.config = config
-        self.running = False
+        # 交易对运行期间不变，绑定为实例属性，行情 / 持仓查询不再逐层访问配置
+        self.symbol = config.strategy.symbol
+        # 停止信号：由信号处理函数 / stop() 置位，立即唤醒主循环的等待
+        self._stop_evt = threading.Event()
         
         # 初始化日志
         self._setup_logging()
@@ -63,20 +107,51 @@ class TradingBot:
             symbol=config.strategy.symbol
         )
         
+        # WebSocket 推送（start() 时启动）：公共频道行情，私有频道订单和持仓
+        self.public_ws: Optional["OKXWebSocketClient"] = None
+        self.private_ws: Optional["OKXWebSocketClient"] = None
+        
+        # 推送得到的最新价格 (monotonic_ns 时间戳, 价格) / 持仓（断线时失效，回退 REST 查询）
+        self._ws_price: Optional[Tuple[int, float]] = None
+        self._ws_position: Optional[PositionInfo] = None
+        self._ws_position_ready = False
+        # 最近一次得到持仓（推送或 REST 核对）的 monotonic_ns 时间
+        self._position_seen_ns = 0
+        # 上次唤醒主循环时行情所在的点位区间
+        self._ws_bracket: Optional[Tuple[int, int]] = None
+        # 行情跨越点位区间、订单或持仓推送时唤醒主循环
+        self._tick_event = threading.Event()
+        
         # 当前状态
         self.current_position: Optional[PositionInfo] = None
+        # 初始化市价单在途截止时间（monotonic_ns），持仓推送 / 查询滞后时防止重复开仓
+        self._market_order_until = 0
         self.last_price: float = 0.0
         
+        # REST 查询缓存 (monotonic_ns 时间戳, 结果)
+        self._price_cache: Optional[Tuple[int, float]] = None
+        self._position_cache: Optional[Tuple[int, Optional[PositionInfo]]] = None
+        self._price_ttl_ns = config.price_ttl_ms * 1_000_000
+        self._position_ttl_ns = config.position_ttl_ms * 1_000_000
+        # 已成功设置的杠杆 {(交易对, 保证金模式): 杠杆倍数}，相同时不再重复请求
+        self._leverage_cache: Dict[Tuple[str, str], int] = {}
+        
+        # 状态输出中只依赖配置的固定部分
+        self._status_header = self._build_status_header()
+        
+        # 价格和持仓查询互不依赖，并发发出以重叠网络往返
+        self._io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bot-io")
+        
         self.logger.info("交易机器人初始化完成")
-        self.logger.info(f"模式: {'测试网(模拟盘)' if config.okx.use_testnet else '正式网(实盘)'}")
-        self.logger.info(f"交易对: {config.strategy.symbol}")
-        self.logger.info(f"默认杠杆: {config.strategy.default_leverage}x")
+        self.logger.info("模式: %s", '测试网(模拟盘)' if config.okx.use_testnet else '正式网(实盘)')
+        self.logger.info("交易对: %s", config.strategy.symbol)
+        self.logger.info("默认杠杆: %sx", config.strategy.default_leverage)
         
         # 打印斐波那契策略配置
         fib = config.strategy.fibonacci
         self.logger.info("=== 斐波那契网格策略 ===")
-        self.logger.info(f"价格范围: ${fib.price_min:.0f} - ${fib.price_max:.0f}")
-        self.logger.info(f"最大持仓: {fib.max_position} 张")
+        self.logger.info("价格范围: $%.0f - $%.0f", fib.price_min, fib.price_max)
+        self.logger.info("最大持仓: %s 张", fib.max_position)
         self.logger.info("=== 限价单配置 ===")
         self.logger.info("L1: 相邻斐波那契点位 + 随机偏移")
         self.logger.info("L2: 下一个斐波那契点位 + 随机偏移 ± 1U")
@@ -87,7 +162,12 @@ class TradingBot:
     def _setup_logging(self):
         """配置日志"""
         log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        log_level = getattr(logging, self.config.log_level.upper(), logging.INFO)
+        log_level = _LEVELS.get(self.config.log_level.upper(), logging.INFO)
+        
+        # 日志格式不输出线程 / 进程信息，创建 LogRecord 时不再采集
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
         
         console_handler = logging.StreamHandler()
         console_handler.setLevel(log_level)
@@ -97,10 +177,21 @@ class TradingBot:
         file_handler.setLevel(log_level)
         file_handler.setFormatter(logging.Formatter(log_format))
         
+        # 交易线程只把日志放入内存队列，由后台线程写控制台和文件
+        log_queue = queue.Queue(-1)
+        self._log_listener = logging.handlers.QueueListener(
+            log_queue, console_handler, file_handler, respect_handler_level=True
+        )
+        self._log_listener.start()
+        atexit.register(self._log_listener.stop)
+        
+        # 入队时只合并 message 参数，完整格式由后台各 handler 输出
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.setFormatter(logging.Formatter('%(message)s'))
+        
         logging.basicConfig(
             level=log_level,
-            format=log_format,
-            handlers=[console_handler, file_handler]
+            handlers=[queue_handler]
         )
         
         self.logger = logging.getLogger(__name__)
@@ -111,37 +202,68 @@ class TradingBot:
             # 获取 OKX 当前持仓
             position = self.get_current_position()
             
-            if position and abs(position.pos) > 0:
-                okx_qty = int(abs(position.pos))
+            size = position.size if position else 0.0
+            if size > 0:
+                okx_qty = int(size)
                 avg_price = position.avg_px
                 
-                self.logger.info(f"OKX 当前持仓: {okx_qty} 张, 均价 ${avg_price:.2f}")
+                self.logger.info("OKX 当前持仓: %s 张, 均价 $%.2f", okx_qty, avg_price)
                 
                 # 检查数据库持仓
-                db_qty, db_avg = self.db.get_total_position(self.config.strategy.symbol)
+                db_qty, db_avg = self.db.get_total_position(self.symbol)
                 
                 if db_qty != okx_qty:
-                    self.logger.warning(f"数据库持仓 ({db_qty}) 与 OKX ({okx_qty}) 不一致")
+                    self.logger.warning("数据库持仓 (%s) 与 OKX (%s) 不一致", db_qty, okx_qty)
                     # 可以选择同步数据库
             else:
                 self.logger.info("当前无持仓")
                 
         except Exception as e:
-            self.logger.error(f"同步初始持仓失败: {e}")
+            self.logger.error("同步初始持仓失败: %s", e)
     
-    def get_current_price(self) -> Optional[float]:
-        """获取当前价格"""
+    def get_current_price(self, force: bool = False) -> Optional[float]:
+        """
+        获取当前价格（price_ttl_ms 内重复查询使用缓存）
+        
+        查询失败时，STALE_PRICE_LIMIT 秒内沿用上次价格，单次网络抖动不会跳过整轮检查
+        
+        Args:
+            force: 跳过缓存，直接查询最新价格（手动下单前使用，失败时不沿用旧价格）
+        """
+        cached = self._price_cache
+        now = _now_ns()
+        if not force and cached and now - cached[0] < self._price_ttl_ns:
+            return cached[1]
+        
         try:
-            result = self.okx_client.get_ticker(self.config.strategy.symbol)
+            result = self.okx_client.get_ticker(self.symbol)
             if result and result.get("code") == "0" and result.get("data"):
                 ticker_data = result["data"][0]
-                return float(ticker_data.get("last", 0))
+                price = float(ticker_data.get("last", 0))
+                self._price_cache = (_now_ns(), price)
+                return price
+            self.logger.warning("获取价格失败: %s", result.get("msg") if result else result)
         except Exception as e:
-            self.logger.error(f"获取价格失败: {e}")
+            self.logger.error("获取价格失败: %s", e)
+        
+        if not force and cached and now - cached[0] < self.STALE_PRICE_LIMIT * 1_000_000_000:
+            return cached[1]
         return None
     
     def get_current_position(self) -> Optional[PositionInfo]:
-        """获取当前持仓"""
+        """
+        获取当前持仓（position_ttl_ms 内重复查询使用缓存）
+        
+        Returns:
+            持仓信息，空仓时为 None
+        
+        Raises:
+            PositionUnavailable: 查询失败或接口返回错误
+        """
+        cached = self._position_cache
+        if cached and _now_ns() - cached[0] < self._position_ttl_ns:
+            return cached[1]
+        
         def safe_float(value, default=0.0):
             """安全转换为 float，处理空字符串"""
             if value is None or value == '':
@@ -163,40 +285,191 @@ class TradingBot:
         try:
             result = self.okx_client.get_positions(
                 inst_type="SWAP",
-                inst_id=self.config.strategy.symbol
+                inst_id=self.symbol
             )
-            if result and result.get("code") == "0" and result.get("data"):
-                pos_data = result["data"][0]
-                position = PositionInfo(
-                    inst_id=pos_data.get("instId", ""),
-                    pos_side=pos_data.get("posSide", "net"),
-                    pos=safe_float(pos_data.get("pos")),
-                    avg_px=safe_float(pos_data.get("avgPx")),
-                    upl=safe_float(pos_data.get("upl")),
-                    upl_ratio=safe_float(pos_data.get("uplRatio")),
-                    lever=safe_int(pos_data.get("lever")),
-                    margin=safe_float(pos_data.get("margin"))
-                )
-                self.current_position = position
-                return position
         except Exception as e:
-            self.logger.error(f"获取持仓失败: {e}")
-        return None
+            self.logger.error("获取持仓失败: %s", e)
+            raise PositionUnavailable(str(e)) from e
+        
+        if not result or result.get("code") != "0":
+            msg = result.get("msg") if result else result
+            self.logger.warning("获取持仓失败: %s", msg)
+            raise PositionUnavailable(str(msg))
+        
+        if not result.get("data"):
+            # 无持仓
+            self._position_cache = (_now_ns(), None)
+            return None
+        
+        pos_data = result["data"][0]
+        position = PositionInfo(
+            inst_id=pos_data.get("instId", ""),
+            pos_side=pos_data.get("posSide", "net"),
+            pos=safe_float(pos_data.get("pos")),
+            avg_px=safe_float(pos_data.get("avgPx")),
+            upl=safe_float(pos_data.get("upl")),
+            upl_ratio=safe_float(pos_data.get("uplRatio")),
+            lever=safe_int(pos_data.get("lever")),
+            margin=safe_float(pos_data.get("margin"))
+        )
+        self.current_position = position
+        self._position_cache = (_now_ns(), position)
+        return position
+    
+    def _invalidate_market_cache(self):
+        """下单或成交后清除价格 / 持仓缓存"""
+        self._price_cache = None
+        self._position_cache = None
+    
+    def _start_websocket(self):
+        """
+        启动 WebSocket 推送
+        
+        公共频道: tickers（最新价格）
+        私有频道: orders（订单状态）+ positions（持仓），一条 subscribe 消息批量订阅
+        """
+        # 只有 run 模式需要 WebSocket，status / buy / sell / test 模式不加载 websocket-client
+        from okx_ws import OKXWebSocketClient
+        
+        symbol = self.symbol
+        
+        self.private_ws = OKXWebSocketClient(
+            self.config.okx,
+            private=True,
+            on_message=self._on_ws_message,
+            on_connect=self.order_manager.on_ws_connected,
+            on_disconnect=self._on_private_ws_disconnected
+        )
+        self.private_ws.subscribe([
+            {"channel": "orders", "instType": "SWAP", "instId": symbol},
+            {"channel": "positions", "instType": "SWAP", "instId": symbol}
+        ])
+        self.private_ws.start()
+        # 限价单通过私有长连接下单（未连接时自动回退 REST）
+        self.order_manager.ws_client = self.private_ws
+        
+        self.public_ws = OKXWebSocketClient(
+            self.config.okx,
+            private=False,
+            on_message=self._on_ws_message,
+            on_disconnect=self._on_public_ws_disconnected
+        )
+        self.public_ws.subscribe([{"channel": "tickers", "instId": symbol}])
+        self.public_ws.start()
+    
+    def _stop_websocket(self):
+        """关闭 WebSocket 推送"""
+        for ws in (self.public_ws, self.private_ws):
+            if ws:
+                ws.stop()
+    
+    def _on_private_ws_disconnected(self):
+        """私有频道断开：订单状态和持仓回退 REST 查询"""
+        self._ws_position_ready = False
+        self.order_manager.on_ws_disconnected()
+    
+    def _on_public_ws_disconnected(self):
+        """公共频道断开：价格回退 REST 查询"""
+        self._ws_price = None
+        self._ws_bracket = None
+    
+    def _on_ws_message(self, channel: str, arg: Dict, data: List[Dict]):
+        """WebSocket 推送分发（在 WebSocket 线程中执行）"""
+        if channel == "tickers":
+            if not data or not data[0].get("last"):
+                return
+            price = float(data[0]["last"])
+            self._ws_price = (_now_ns(), price)
+            # 同一点位区间内的行情变化不改变挂单规划，不唤醒主循环（check_interval 超时兜底）
+            bracket = self.order_manager.price_bracket(price)
+            if bracket == self._ws_bracket:
+                return
+            self._ws_bracket = bracket
+        elif channel == "orders":
+            self.order_manager.on_ws_orders(data)
+        elif channel == "positions":
+            # 推送为该合约的全量持仓，空仓时为空列表
+            positions = PositionInfo.from_response({"data": data})
+            self._ws_position = positions[0] if positions else None
+            self._position_seen_ns = _now_ns()
+            self._ws_position_ready = True
+        else:
+            return
+        self._tick_event.set()
+    
+    def _push_ready(self) -> bool:
+        """行情和私有推送均已连接，可由推送驱动主循环"""
+        return bool(
+            self.public_ws and self.public_ws.connected
+            and self.private_ws and self.private_ws.connected
+        )
+    
+    def _next_sleep(self) -> float:
+        """
+        下一轮等待时间
+        
+        价格超出交易范围时放慢轮询；价格接近活跃挂单时加快轮询，缩短成交后的补单延迟
+        """
+        interval = self.config.check_interval
+        price = self.last_price
+        
+        if not price or not self.fib_strategy.is_price_in_range(price):
+            return interval * self.IDLE_INTERVAL_FACTOR
+        
+        orders = self.order_manager.active_orders()
+        if orders and min(abs(order.price - price) for order in orders) <= price * self.NEAR_ORDER_RATIO:
+            interval = min(interval, self.FAST_CHECK_INTERVAL)
+        
+        return max(interval, self.MIN_CHECK_INTERVAL)
+    
+    def _latest_price(self) -> Optional[float]:
+        """最新价格：优先推送，推送断开或超过 WS_PRICE_MAX_AGE 未更新时 REST 查询"""
+        pushed = self._ws_price
+        if pushed and _now_ns() - pushed[0] < self.WS_PRICE_MAX_AGE * 1_000_000_000:
+            return pushed[1]
+        return self.get_current_price()
+    
+    def _latest_position(self) -> Optional[PositionInfo]:
+        """最新持仓：优先推送，推送断开或超过 POSITION_RECONCILE_INTERVAL 无更新时 REST 查询"""
+        if not self._ws_position_ready:
+            return self.get_current_position()
+        
+        seen = self._position_seen_ns
+        if _now_ns() - seen < self.POSITION_RECONCILE_INTERVAL * 1_000_000_000:
+            self.current_position = self._ws_position
+            return self._ws_position
+        
+        # 绕过缓存查询，失败时沿用推送持仓
+        self._position_cache = None
+        try:
+            position = self.get_current_position()
+        except PositionUnavailable:
+            self.current_position = self._ws_position
+            return self._ws_position
+        if self._position_seen_ns == seen:
+            # 查询期间没有新的推送，以 REST 结果校正推送持仓
+            self._ws_position = position
+            self._position_seen_ns = _now_ns()
+        return position
     
     def run_once(self):
         """执行一次交易检查"""
         try:
-            # 获取当前价格
-            price = self.get_current_price()
+            # 并发获取当前价格和持仓
+            price_future = self._io_pool.submit(self._latest_price)
+            try:
+                position = self._latest_position()
+            except PositionUnavailable:
+                # 查询失败不能当作空仓，否则会触发初始化买入
+                self.logger.warning("无法获取持仓，跳过本轮检查")
+                return
+            price = price_future.result()
             if not price:
                 self.logger.warning("无法获取价格")
                 return
             
             self.last_price = price
-            
-            # 获取当前持仓
-            position = self.get_current_position()
-            current_qty = int(abs(position.pos)) if position else 0
+            current_qty = int(position.size) if position else 0
             
             # 更新斐波那契策略的当前持仓
             self.fib_strategy.current_position = current_qty
@@ -205,16 +478,20 @@ class TradingBot:
             filled_orders = self.order_manager.check_filled_orders(current_qty)
             
             if filled_orders:
+                self._invalidate_market_cache()
                 # 有订单成交，更新持仓数量
                 for order in filled_orders:
                     if order.side == "buy":
                         current_qty += order.quantity
                     else:
                         current_qty -= order.quantity
-                    self.logger.info(f"订单成交 L{order.level}: {order.side} {order.quantity} 张 @ ${order.price:.1f}")
+                    self.logger.info("订单成交 L%s: %s %s 张 @ $%.1f", order.level, order.side, order.quantity, order.price)
             
             # 检查是否需要初始化买入
             if current_qty == 0:
+                if _now_ns() < self._market_order_until:
+                    self.logger.info("初始化买入已提交，等待持仓更新")
+                    return
                 signal = self.fib_strategy.generate_signal(price, current_qty)
                 if signal and signal.action == TradeAction.BUY and "初始化" in signal.reason:
                     self._execute_market_buy(signal, price)
@@ -224,42 +501,54 @@ class TradingBot:
             self.order_manager.update_orders(price, current_qty)
             
         except Exception as e:
-            self.logger.error(f"交易检查异常: {e}")
+            self.logger.error("交易检查异常: %s", e)
+    
+    def _ensure_leverage(self, mgn_mode: str = "cross"):
+        """设置默认杠杆，已成功设置过相同杠杆时跳过请求"""
+        key = (self.symbol, mgn_mode)
+        lever = self.config.strategy.default_leverage
+        if self._leverage_cache.get(key) == lever:
+            return
+        
+        result = self.okx_client.set_leverage(inst_id=self.symbol, lever=lever, mgn_mode=mgn_mode)
+        if result.get("code") == "0":
+            self._leverage_cache[key] = lever
+        else:
+            self.logger.warning("设置杠杆失败: %s", result)
     
     def _execute_market_buy(self, signal: FibonacciSignal, price: float):
         """执行市价买入（用于初始化）"""
         try:
-            # 设置杠杆
-            self.okx_client.set_leverage(
-                inst_id=self.config.strategy.symbol,
-                lever=self.config.strategy.default_leverage,
-                mgn_mode="cross"
-            )
+            # 设置杠杆（已设置过相同杠杆时跳过）
+            self._ensure_leverage()
             
-            # 下单买入
+            # 下单买入；发送前设置在途截止时间（超时或异常时订单也可能已成交），持仓反映前不再重复买入
+            self._market_order_until = _now_ns() + self.MARKET_ORDER_SETTLE_TIME * 1_000_000_000
             result = self.okx_client.place_order(
-                inst_id=self.config.strategy.symbol,
+                inst_id=self.symbol,
                 td_mode="cross",
                 side="buy",
                 order_type="market",
                 sz=str(signal.quantity)
             )
+            self._invalidate_market_cache()
             
             if result.get("code") == "0":
                 total_value = price * signal.quantity
                 self.logger.info(
-                    f"初始化买入成功: {signal.quantity} 张 @ ${price:.2f}, "
-                    f"合约金额 ${total_value:.2f}"
+                    "初始化买入成功: %s 张 @ $%.2f, 合约金额 $%.2f",
+                    signal.quantity, price, total_value
                 )
                 
                 # 记录到数据库
                 self.db.record_buy(
-                    symbol=self.config.strategy.symbol,
+                    symbol=self.symbol,
                     entry_price=price,
                     quantity=signal.quantity,
                     direction="LONG",
                     notes=f"初始化买入: {signal.reason}"
                 )
+                self.order_manager.invalidate_cost_cache()
                 
                 # 发送 Telegram 通知
                 self.notifier.send_fibonacci_trade_notification(
@@ -272,33 +561,35 @@ class TradingBot:
                 )
                 
             else:
-                self.logger.error(f"初始化买入失败: {result}")
+                self.logger.error("初始化买入失败: %s", result)
+                if result.get("code") != OKXClient.REQUEST_FAILED_CODE:
+                    # 交易所明确拒绝，订单不会成交，下一轮可以重新判断
+                    self._market_order_until = 0
+                # 杠杆可能已在交易所侧被修改，下次买入前重新设置
+                self._leverage_cache.clear()
                 
         except Exception as e:
-            self.logger.error(f"初始化买入异常: {e}")
+            self.logger.error("初始化买入异常: %s", e)
     
     def manual_buy(self, quantity: int):
         """手动买入"""
         try:
-            price = self.get_current_price()
+            price = self.get_current_price(force=True)
             if not price:
                 print("无法获取当前价格")
                 return
             
-            # 设置杠杆
-            self.okx_client.set_leverage(
-                inst_id=self.config.strategy.symbol,
-                lever=self.config.strategy.default_leverage,
-                mgn_mode="cross"
-            )
+            # 设置杠杆（已设置过相同杠杆时跳过）
+            self._ensure_leverage()
             
             result = self.okx_client.place_order(
-                inst_id=self.config.strategy.symbol,
+                inst_id=self.symbol,
                 td_mode="cross",
                 side="buy",
                 order_type="market",
                 sz=str(quantity)
             )
+            self._invalidate_market_cache()
             
             if result.get("code") == "0":
                 total_value = price * quantity
@@ -306,14 +597,16 @@ class TradingBot:
                 
                 # 记录到数据库
                 self.db.record_buy(
-                    symbol=self.config.strategy.symbol,
+                    symbol=self.symbol,
                     entry_price=price,
                     quantity=quantity,
                     direction="LONG",
                     notes="手动买入"
                 )
+                self.order_manager.invalidate_cost_cache()
             else:
                 print(f"买入失败: {result}")
+                self._leverage_cache.clear()
                 
         except Exception as e:
             print(f"买入异常: {e}")
@@ -321,19 +614,20 @@ class TradingBot:
     def manual_sell(self, quantity: int):
         """手动卖出"""
         try:
-            price = self.get_current_price()
+            price = self.get_current_price(force=True)
             if not price:
                 print("无法获取当前价格")
                 return
             
             result = self.okx_client.place_order(
-                inst_id=self.config.strategy.symbol,
+                inst_id=self.symbol,
                 td_mode="cross",
                 side="sell",
                 order_type="market",
                 sz=str(quantity),
                 reduce_only=True
             )
+            self._invalidate_market_cache()
             
             if result.get("code") == "0":
                 total_value = price * quantity
@@ -341,11 +635,12 @@ class TradingBot:
                 
                 # 使用 FIFO 计算盈亏
                 trade_id, sell_result = self.db.record_sell_fifo(
-                    symbol=self.config.strategy.symbol,
+                    symbol=self.symbol,
                     exit_price=price,
                     quantity=quantity,
                     direction="LONG"
                 )
+                self.order_manager.invalidate_cost_cache()
                 
                 if sell_result and sell_result.total_quantity > 0:
                     print(f"本次利润: ${sell_result.total_pnl:.2f}")
@@ -355,91 +650,109 @@ class TradingBot:
         except Exception as e:
             print(f"卖出异常: {e}")
     
-    def show_status(self):
-        """显示当前状态"""
-        print("\n" + "=" * 70)
-        print("SOL 全仓合约交易机器人状态 (斐波那契策略 + 二级限价单)")
-        print("=" * 70)
+    def _build_status_header(self) -> Tuple[str, ...]:
+        """构建状态输出中只依赖配置的固定部分（初始化时生成一次）"""
+        lines = [
+            "",
+            "=" * 70,
+            "SOL 全仓合约交易机器人状态 (斐波那契策略 + 二级限价单)",
+            "=" * 70
+        ]
         
         # 基本信息
-        print(f"模式: {'测试网(模拟盘)' if self.config.okx.use_testnet else '正式网(实盘)'}")
-        print(f"交易对: {self.config.strategy.symbol}")
-        print(f"默认杠杆: {self.config.strategy.default_leverage}x")
+        lines.append(f"模式: {'测试网(模拟盘)' if self.config.okx.use_testnet else '正式网(实盘)'}")
+        lines.append(f"交易对: {self.symbol}")
+        lines.append(f"默认杠杆: {self.config.strategy.default_leverage}x")
         
         # 斐波那契配置
         fib = self.config.strategy.fibonacci
-        print("-" * 70)
-        print("斐波那契策略配置:")
-        print(f"  价格范围: ${fib.price_min:.0f} - ${fib.price_max:.0f}")
-        print(f"  最大持仓: {fib.max_position} 张")
+        lines.append("-" * 70)
+        lines.append("斐波那契策略配置:")
+        lines.append(f"  价格范围: ${fib.price_min:.0f} - ${fib.price_max:.0f}")
+        lines.append(f"  最大持仓: {fib.max_position} 张")
         
         # 限价单配置
-        print("-" * 70)
-        print("限价单配置:")
-        print("  L1: 相邻斐波那契点位 + 随机偏移 (.2/.3/.6/.7)")
-        print("  L2: 下一个斐波那契点位 + 随机偏移 ± 1U")
+        lines.append("-" * 70)
+        lines.append("限价单配置:")
+        lines.append("  L1: 相邻斐波那契点位 + 随机偏移 (.2/.3/.6/.7)")
+        lines.append("  L2: 下一个斐波那契点位 + 随机偏移 ± 1U")
         
-        # 当前价格和持仓
-        price = self.get_current_price()
-        position = self.get_current_position()
+        return tuple(lines)
+    
+    def show_status(self):
+        """显示当前状态（整体拼接后一次性输出）"""
+        lines = list(self._status_header)
+        
+        # 当前价格和持仓（并发查询）
+        price_future = self._io_pool.submit(self.get_current_price)
+        try:
+            position = self.get_current_position()
+            position_error = False
+        except PositionUnavailable:
+            position, position_error = None, True
+        price = price_future.result()
         
-        print("-" * 70)
+        lines.append("-" * 70)
         if price:
-            print(f"当前价格: ${price:.2f}")
+            lines.append(f"当前价格: ${price:.2f}")
             target_pos = self.fib_strategy.calculate_target_position(price)
-            print(f"目标持仓: {target_pos} 张")
-        
-        if position and abs(position.pos) > 0:
-            qty = int(abs(position.pos))
-            print(f"当前持仓: {qty} 张")
-            print(f"持仓均价: ${position.avg_px:.2f}")
-            print(f"未实现盈亏: ${position.upl:.2f}")
+            lines.append(f"目标持仓: {target_pos} 张")
+        
+        size = position.size if position else 0.0
+        if position_error:
+            lines.append("当前持仓: 查询失败")
+        elif size > 0:
+            qty = int(size)
+            lines.append(f"当前持仓: {qty} 张")
+            lines.append(f"持仓均价: ${position.avg_px:.2f}")
+            lines.append(f"未实现盈亏: ${position.upl:.2f}")
         else:
-            print("当前持仓: 无")
+            lines.append("当前持仓: 无")
         
         # 限价单状态
-        print("-" * 70)
-        print("当前限价单:")
+        lines.append("-" * 70)
+        lines.append("当前限价单:")
         status = self.order_manager.get_status()
         
         if status["buy_order_l1"]:
             o = status["buy_order_l1"]
-            print(f"  买入 L1: ${o['price']:.1f} x {o['quantity']} 张 (Fib {o['fib_level']:.3f})")
+            lines.append(f"  买入 L1: ${o['price']:.1f} x {o['quantity']} 张 (Fib {o['fib_level']:.3f})")
         else:
-            print("  买入 L1: 无")
+            lines.append("  买入 L1: 无")
         
         if status["buy_order_l2"]:
             o = status["buy_order_l2"]
-            print(f"  买入 L2: ${o['price']:.1f} x {o['quantity']} 张 (Fib {o['fib_level']:.3f})")
+            lines.append(f"  买入 L2: ${o['price']:.1f} x {o['quantity']} 张 (Fib {o['fib_level']:.3f})")
         else:
-            print("  买入 L2: 无")
+            lines.append("  买入 L2: 无")
         
         if status["sell_order_l1"]:
             o = status["sell_order_l1"]
-            print(f"  卖出 L1: ${o['price']:.1f} x {o['quantity']} 张 (Fib {o['fib_level']:.3f})")
+            lines.append(f"  卖出 L1: ${o['price']:.1f} x {o['quantity']} 张 (Fib {o['fib_level']:.3f})")
         else:
-            print("  卖出 L1: 无")
+            lines.append("  卖出 L1: 无")
         
         if status["sell_order_l2"]:
             o = status["sell_order_l2"]
-            print(f"  卖出 L2: ${o['price']:.1f} x {o['quantity']} 张 (Fib {o['fib_level']:.3f})")
+            lines.append(f"  卖出 L2: ${o['price']:.1f} x {o['quantity']} 张 (Fib {o['fib_level']:.3f})")
         else:
-            print("  卖出 L2: 无")
+            lines.append("  卖出 L2: 无")
         
         # 数据库统计
-        print("-" * 70)
-        print("交易统计 (数据库):")
-        db_qty, db_avg = self.db.get_total_position(self.config.strategy.symbol)
-        print(f"  数据库持仓: {db_qty} 张")
+        lines.append("-" * 70)
+        lines.append("交易统计 (数据库):")
+        db_qty, db_avg = self.db.get_total_position(self.symbol)
+        lines.append(f"  数据库持仓: {db_qty} 张")
         if db_avg:
-            print(f"  平均成本: ${db_avg:.2f}")
+            lines.append(f"  平均成本: ${db_avg:.2f}")
+        
+        lines.append("=" * 70)
         
-        print("=" * 70)
+        print("\n".join(lines))
     
     def show_fib_levels(self):
         """显示斐波那契点位和价格偏移示例"""
-        print("\n斐波那契点位及价格偏移示例:")
-        print("-" * 70)
+        lines = ["\n斐波那契点位及价格偏移示例:", "-" * 70]
         
         for level, fib_price, target_pos in self.fib_strategy.fib_levels:
             buy_l1 = adjust_buy_price_v2(fib_price, is_level2=False)
@@ -447,16 +760,19 @@ class TradingBot:
             sell_l1 = adjust_sell_price_v2(fib_price, is_level2=False)
             sell_l2 = adjust_sell_price_v2(fib_price, is_level2=True)
             
-            print(f"  {level:.3f} | 基准 ${fib_price:.2f} | 买L1 ${buy_l1:.1f} | 买L2 ${buy_l2:.1f} | 卖L1 ${sell_l1:.1f} | 卖L2 ${sell_l2:.1f} | 目标 {target_pos}张")
+            lines.append(f"  {level:.3f} | 基准 ${fib_price:.2f} | 买L1 ${buy_l1:.1f} | 买L2 ${buy_l2:.1f} | 卖L1 ${sell_l1:.1f} | 卖L2 ${sell_l2:.1f} | 目标 {target_pos}张")
+        
+        # 与 show_status 一致，整体拼接后一次输出
+        print("\n".join(lines))
     
     def start(self):
         """启动机器人"""
-        self.running = True
+        self._stop_evt.clear()
         
         # 设置信号处理
         def signal_handler(signum, frame):
             self.logger.info("收到停止信号，正在关闭...")
-            self.running = False
+            self.stop()
         
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
@@ -464,11 +780,15 @@ class TradingBot:
         # 同步交易所订单状态
         self.order_manager.sync_with_exchange()
         
+        # 行情、订单状态和持仓改为推送获取（断线时自动回退 REST 查询）
+        if self.config.okx.ws_enabled:
+            self._start_websocket()
+        
         # 发送启动通知
         self.notifier.send_message(
             "🤖 交易机器人启动\n\n"
             f"模式: {'测试网' if self.config.okx.use_testnet else '正式网'}\n"
-            f"交易对: {self.config.strategy.symbol}\n"
+            f"交易对: {self.symbol}\n"
             f"策略: 斐波那契网格 + 二级限价单\n"
             f"价格范围: ${self.config.strategy.fibonacci.price_min:.0f} - ${self.config.strategy.fibonacci.price_max:.0f}\n"
             f"最大持仓: {self.config.strategy.fibonacci.max_position} 张"
@@ -476,26 +796,44 @@ class TradingBot:
         
         self.logger.info("交易机器人启动")
         
-        # 首次运行
-        self.run_once()
-        
-        # 主循环
-        interval = self.config.check_interval
-        while self.running:
+        # 循环内不变的方法和配置预先绑定为局部变量，每轮不再逐层查找属性
+        run_once = self.run_once
+        push_ready = self._push_ready
+        next_sleep = self._next_sleep
+        stopped = self._stop_evt.is_set
+        wait_stop = self._stop_evt.wait
+        clear_tick = self._tick_event.clear
+        wait_tick = self._tick_event.wait
+        check_interval = self.config.check_interval
+        
+        # 主循环：推送可用时由行情/订单/持仓推送唤醒，否则按自适应间隔轮询
+        while not stopped():
+            clear_tick()
+            started = _now_ns()
             try:
-                self.run_once()
-                time.sleep(interval)
+                run_once()
             except Exception as e:
-                self.logger.error(f"主循环异常: {e}")
-                time.sleep(interval)
+                self.logger.error("主循环异常: %s", e)
+            
+            if push_ready():
+                wait_tick(check_interval)
+            else:
+                # 扣除本轮检查耗时，保持固定的轮询节奏
+                elapsed = (_now_ns() - started) / 1e9
+                wait_stop(max(next_sleep() - elapsed, 0.0))
         
         # 关闭前取消所有挂单
         self.order_manager._cancel_all_orders()
+        self._stop_websocket()
+        self._io_pool.shutdown(wait=False)
+        self.order_manager.close()
+        self.db.close()
         self.logger.info("交易机器人已停止")
     
     def stop(self):
-        """停止机器人"""
-        self.running = False
+        """停止机器人（推送驱动时一并唤醒 _tick_event 等待）"""
+        self._stop_evt.set()
+        self._tick_event.set()
 
 
 def main():
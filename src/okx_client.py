@@ -10,18 +10,36 @@ import time
 from datetime import datetime, timezone
 from typing import Dict, Any, Optional, List
 import requests
-from dataclasses import dataclass
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dataclasses import dataclass, field
 
 from config import OKXConfig
+import json_codec
 
 
 class OKXClient:
     """OKX API 客户端"""
     
+    # 请求超时 (连接, 读取) 秒；GET 还会按重试策略重试，需保持较短以免单次查询长时间阻塞主循环
+    REQUEST_TIMEOUT = (3, 5)
+    # 请求未得到有效响应（网络错误、超时、响应无法解析）时返回的 code，此时请求结果未知
+    REQUEST_FAILED_CODE = "-1"
+    
     def __init__(self, config: OKXConfig):
         self.config = config
         self.base_url = config.base_url
+        # 复用 keep-alive 连接；连接池容量覆盖订单状态并发查询线程数
+        # 连接失败和网关错误只对 GET 查询自动重试，下单等 POST 请求不重试，避免重复下单
+        retry = Retry(
+            total=2,
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False
+        )
         self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry))
         
     def _get_timestamp(self) -> str:
         """获取 ISO 格式时间戳"""
@@ -62,22 +80,24 @@ class OKXClient:
             endpoint = f"{endpoint}?{query_string}"
             url = self.base_url + endpoint
         elif data:
-            body = json.dumps(data)
+            body = json_codec.dumps(data)
         
         headers = self._get_headers(method, endpoint, body)
         
         try:
             if method.upper() == "GET":
-                response = self.session.get(url, headers=headers, timeout=30)
+                response = self.session.get(url, headers=headers, timeout=self.REQUEST_TIMEOUT)
             elif method.upper() == "POST":
-                response = self.session.post(url, headers=headers, data=body, timeout=30)
+                response = self.session.post(url, headers=headers, data=body.encode('utf-8'), timeout=self.REQUEST_TIMEOUT)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
             response.raise_for_status()
-            return response.json()
+            return json_codec.loads(response.content)
         except requests.exceptions.RequestException as e:
-            return {"code": "-1", "msg": str(e), "data": []}
+            return {"code": self.REQUEST_FAILED_CODE, "msg": str(e), "data": []}
+        except json_codec.JSONDecodeError as e:
+            return {"code": self.REQUEST_FAILED_CODE, "msg": f"响应解析失败: {e}", "data": []}
     
     # ==================== 公共接口 ====================
     
@@ -168,7 +188,8 @@ class OKXClient:
         tp_trigger_px: str = None,
         tp_ord_px: str = None,
         sl_trigger_px: str = None,
-        sl_ord_px: str = None
+        sl_ord_px: str = None,
+        cl_ord_id: str = None
     ) -> Dict:
         """下单
         
@@ -185,8 +206,43 @@ class OKXClient:
             tp_ord_px: 止盈委托价 (-1 为市价)
             sl_trigger_px: 止损触发价
             sl_ord_px: 止损委托价 (-1 为市价)
+            cl_ord_id: 客户自定义订单 ID (字母数字，最长 32 位)
         """
         endpoint = "/api/v5/trade/order"
+        data = self.build_order_data(
+            inst_id=inst_id,
+            td_mode=td_mode,
+            side=side,
+            order_type=order_type,
+            sz=sz,
+            pos_side=pos_side,
+            px=px,
+            reduce_only=reduce_only,
+            tp_trigger_px=tp_trigger_px,
+            tp_ord_px=tp_ord_px,
+            sl_trigger_px=sl_trigger_px,
+            sl_ord_px=sl_ord_px,
+            cl_ord_id=cl_ord_id
+        )
+        return self._request("POST", endpoint, data=data)
+    
+    @staticmethod
+    def build_order_data(
+        inst_id: str,
+        td_mode: str,
+        side: str,
+        order_type: str,
+        sz: str,
+        pos_side: str = None,
+        px: str = None,
+        reduce_only: bool = False,
+        tp_trigger_px: str = None,
+        tp_ord_px: str = None,
+        sl_trigger_px: str = None,
+        sl_ord_px: str = None,
+        cl_ord_id: str = None
+    ) -> Dict:
+        """构造下单请求体（单笔下单和批量下单共用，参数同 place_order）"""
         data = {
             "instId": inst_id,
             "tdMode": td_mode,
@@ -201,6 +257,8 @@ class OKXClient:
             data["px"] = px
         if reduce_only:
             data["reduceOnly"] = "true"
+        if cl_ord_id:
+            data["clOrdId"] = cl_ord_id
         
         # 止盈止损
         if tp_trigger_px:
@@ -210,7 +268,20 @@ class OKXClient:
             data["slTriggerPx"] = sl_trigger_px
             data["slOrdPx"] = sl_ord_px or "-1"
         
-        return self._request("POST", endpoint, data=data)
+        return data
+    
+    def place_batch_orders(self, orders: List[Dict]) -> Dict:
+        """批量下单（单次最多 20 个订单）
+        
+        Args:
+            orders: 订单请求体列表，可由 build_order_data 构造
+            
+        Returns:
+            OKX 响应，data 中每一项按请求顺序对应一个订单，
+            通过 sCode / sMsg 判断单个订单是否成功
+        """
+        endpoint = "/api/v5/trade/batch-orders"
+        return self._request("POST", endpoint, data=orders)
     
     def close_position(self, inst_id: str, mgn_mode: str = "cross", pos_side: str = None) -> Dict:
         """市价全平
@@ -239,6 +310,19 @@ class OKXClient:
             data["clOrdId"] = cl_ord_id
         return self._request("POST", endpoint, data=data)
     
+    def cancel_batch_orders(self, orders: List[Dict]) -> Dict:
+        """批量撤单（单次最多 20 个订单）
+        
+        Args:
+            orders: [{"instId": ..., "ordId": ...}, ...]
+            
+        Returns:
+            OKX 响应，data 中每一项按请求顺序对应一个订单，
+            通过 sCode / sMsg 判断单个订单是否撤销成功
+        """
+        endpoint = "/api/v5/trade/cancel-batch-orders"
+        return self._request("POST", endpoint, data=orders)
+    
     def get_order(self, inst_id: str, ord_id: str = None, cl_ord_id: str = None) -> Dict:
         """获取订单信息"""
         endpoint = "/api/v5/trade/order"
@@ -333,7 +417,7 @@ class OKXClient:
         return self._request("GET", endpoint, params=params)
 
 
-@dataclass
+@dataclass(slots=True)
 class TickerInfo:
     """行情信息"""
     inst_id: str
@@ -363,7 +447,7 @@ class TickerInfo:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class PositionInfo:
     """持仓信息"""
     inst_id: str
@@ -374,6 +458,10 @@ class PositionInfo:
     upl_ratio: float  # 未实现盈亏率
     lever: int  # 杠杆倍数
     margin: float  # 保证金
+    size: float = field(init=False)  # 持仓张数（pos 的绝对值，构造时计算一次）
+    
+    def __post_init__(self):
+        self.size = abs(self.pos)
     
     @classmethod
     def from_response(cls, data: Dict) -> List["PositionInfo"]:
@@ -0,0 +1,299 @@
+"""
+OKX WebSocket 客户端模块
+在后台线程维护长连接，支持私有频道登录、心跳保活和断线重连
+"""
+import hmac
+import base64
+import hashlib
+import itertools
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+import websocket
+
+from config import OKXConfig
+import json_codec
+
+
+class OKXWebSocketClient:
+    """OKX WebSocket 客户端（后台线程运行）"""
+
+    # 无数据超过该时间（秒）发送 ping，OKX 30 秒内无数据会主动断开连接
+    PING_INTERVAL = 20
+    # 心跳检查间隔（秒），保证静默 PING_INTERVAL + HEARTBEAT_POLL 内一定发出 ping
+    HEARTBEAT_POLL = 5
+    # ping 后等待响应的时间（秒），超时视为连接已失效（半开连接），主动断开重连
+    PONG_TIMEOUT = 5
+    # 断线重连最大等待时间（秒）
+    MAX_RECONNECT_DELAY = 60
+    # 下单等请求等待响应的超时时间（秒）
+    REQUEST_TIMEOUT = 5
+
+    def __init__(
+        self,
+        config: OKXConfig,
+        private: bool = False,
+        on_message: Callable[[str, Dict, List[Dict]], None] = None,
+        on_connect: Callable[[], None] = None,
+        on_disconnect: Callable[[], None] = None
+    ):
+        """
+        Args:
+            config: OKX 配置
+            private: 是否连接私有频道（需要登录）
+            on_message: 推送回调 (channel, arg, data)
+            on_connect: 登录并订阅成功后的回调（每次重连都会触发）
+            on_disconnect: 连接断开回调
+        """
+        self.config = config
+        self.private = private
+        self.url = config.ws_private_url if private else config.ws_public_url
+        self.on_message = on_message
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.logger = logging.getLogger(__name__)
+
+        # 订阅参数，重连后自动重新订阅
+        self._subscriptions: List[Dict] = []
+
+        self._ws: Optional[websocket.WebSocketApp] = None
+        self._thread: Optional[threading.Thread] = None
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._last_recv = 0.0
+        self._reconnect_delay = 1
+
+        # 等待响应的请求 {id: [Event, 响应]}，由 WebSocket 线程按 id 回填
+        self._pending: Dict[str, list] = {}
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        
+        # 登录（私有频道）并订阅成功后为 True
+        self.connected = False
+
+    # ==================== 生命周期 ====================
+
+    def subscribe(self, args: List[Dict]):
+        """
+        订阅频道
+
+        Args:
+            args: 订阅参数列表，如 [{"channel": "orders", "instType": "SWAP"}]
+        """
+        self._subscriptions.extend(args)
+        if self.connected:
+            self._send({"op": "subscribe", "args": args})
+
+    def start(self):
+        """启动后台连接线程"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_forever, name="okx-ws", daemon=True)
+        self._thread.start()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="okx-ws-ping", daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop(self):
+        """关闭连接并停止重连"""
+        self._stop_event.set()
+        if self._ws:
+            self._ws.close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def request(self, op: str, args: List[Dict], timeout: float = None) -> Dict:
+        """
+        发送业务请求（如 order / batch-orders）并等待同 id 的响应
+        
+        Args:
+            op: 操作名
+            args: 请求参数列表
+            timeout: 等待响应超时（秒），默认 REQUEST_TIMEOUT
+        
+        Returns:
+            OKX 响应，格式与 REST 接口一致（code / msg / data）
+        
+        Raises:
+            ConnectionError: 连接不可用或发送失败（请求未发出，可安全改用 REST）
+            TimeoutError: 已发出但未在超时内收到响应（结果未知）
+        """
+        if not self.connected:
+            raise ConnectionError("WebSocket 未连接")
+        
+        req_id = str(next(self._request_ids))
+        slot = [threading.Event(), None]
+        with self._pending_lock:
+            self._pending[req_id] = slot
+        
+        try:
+            if not self._send({"id": req_id, "op": op, "args": args}):
+                raise ConnectionError("WebSocket 发送失败")
+            if not slot[0].wait(timeout or self.REQUEST_TIMEOUT):
+                raise TimeoutError(f"WebSocket 请求超时: {op} id={req_id}")
+            if slot[1] is None:
+                raise TimeoutError(f"WebSocket 请求期间连接断开: {op} id={req_id}")
+            return slot[1]
+        finally:
+            with self._pending_lock:
+                self._pending.pop(req_id, None)
+    
+    def _run_forever(self):
+        """连接主循环：断开后按指数退避重连"""
+        while not self._stop_event.is_set():
+            self._ws = websocket.WebSocketApp(
+                self.url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close
+            )
+            self._ws.run_forever()
+
+            if self._stop_event.is_set():
+                break
+
+            self.logger.warning("WebSocket 连接断开，%s 秒后重连: %s", self._reconnect_delay, self.url)
+            self._stop_event.wait(self._reconnect_delay)
+            self._reconnect_delay = min(self._reconnect_delay * 2, self.MAX_RECONNECT_DELAY)
+
+    def _heartbeat_loop(self):
+        """心跳：超过 PING_INTERVAL 未收到数据时发送 ping，PONG_TIMEOUT 内仍无数据则断开重连"""
+        ping_sent_at = None
+        while not self._stop_event.wait(self.HEARTBEAT_POLL):
+            ws = self._ws
+            if not (ws and ws.sock and ws.sock.connected):
+                ping_sent_at = None
+                continue
+            
+            now = time.monotonic()
+            if now - self._last_recv < self.PING_INTERVAL:
+                ping_sent_at = None
+                continue
+            
+            if ping_sent_at is None:
+                try:
+                    ws.send("ping")
+                    ping_sent_at = now
+                except Exception as e:
+                    self.logger.debug("WebSocket 心跳发送失败: %s", e)
+            elif now - ping_sent_at >= self.PONG_TIMEOUT:
+                self.logger.warning("WebSocket %s 秒未收到心跳响应，断开重连: %s", self.PONG_TIMEOUT, self.url)
+                ping_sent_at = None
+                ws.close()
+
+    # ==================== 回调处理 ====================
+
+    def _on_open(self, ws):
+        self._last_recv = time.monotonic()
+        self.logger.info("WebSocket 已连接: %s", self.url)
+
+        if self.private:
+            self._send(self._login_message())
+        else:
+            self._send_subscriptions()
+
+    def _on_message(self, ws, message: str):
+        self._last_recv = time.monotonic()
+
+        if message == "pong":
+            return
+
+        try:
+            msg = json_codec.loads(message)
+        except json_codec.JSONDecodeError:
+            self.logger.warning("WebSocket 消息解析失败: %s", message[:200])
+            return
+
+        req_id = msg.get("id")
+        if req_id is not None:
+            with self._pending_lock:
+                slot = self._pending.get(req_id)
+            if slot:
+                slot[1] = msg
+                slot[0].set()
+            return
+        
+        event = msg.get("event")
+        if event == "login":
+            if msg.get("code") == "0":
+                self.logger.info("WebSocket 登录成功")
+                self._send_subscriptions()
+            else:
+                self.logger.error("WebSocket 登录失败: %s", msg.get('msg'))
+            return
+
+        if event == "subscribe":
+            self.logger.info("WebSocket 订阅成功: %s", msg.get('arg'))
+            if not self.connected:
+                self.connected = True
+                self._reconnect_delay = 1
+                if self.on_connect:
+                    self.on_connect()
+            return
+
+        if event == "error":
+            self.logger.error("WebSocket 错误: %s %s", msg.get('code'), msg.get('msg'))
+            return
+
+        arg = msg.get("arg")
+        data = msg.get("data")
+        if arg and data is not None and self.on_message:
+            try:
+                self.on_message(arg.get("channel", ""), arg, data)
+            except Exception as e:
+                self.logger.error("WebSocket 推送处理异常: %s", e)
+
+    def _on_error(self, ws, error):
+        self.logger.error("WebSocket 异常: %s", error)
+
+    def _on_close(self, ws, close_status_code, close_msg):
+        was_connected = self.connected
+        self.connected = False
+        
+        # 断线后不会再收到响应，唤醒所有等待中的请求
+        with self._pending_lock:
+            for slot in self._pending.values():
+                slot[0].set()
+        
+        if was_connected and self.on_disconnect:
+            self.on_disconnect()
+
+    # ==================== 内部工具 ====================
+
+    def _send(self, payload: Dict) -> bool:
+        """发送 JSON 消息"""
+        try:
+            self._ws.send(json_codec.dumps(payload))
+            return True
+        except Exception as e:
+            self.logger.error("WebSocket 发送失败: %s", e)
+            return False
+
+    def _send_subscriptions(self):
+        """一次性发送全部订阅（单个 subscribe 消息携带多个频道）"""
+        if self._subscriptions:
+            self._send({"op": "subscribe", "args": self._subscriptions})
+
+    def _login_message(self) -> Dict:
+        """生成私有频道登录消息"""
+        timestamp = str(int(time.time()))
+        message = timestamp + "GET" + "/users/self/verify"
+        mac = hmac.new(
+            self.config.secret_key.encode('utf-8'),
+            message.encode('utf-8'),
+            hashlib.sha256
+        )
+        sign = base64.b64encode(mac.digest()).decode('utf-8')
+        return {
+            "op": "login",
+            "args": [{
+                "apiKey": self.config.api_key,
+                "passphrase": self.config.passphrase,
+                "timestamp": timestamp,
+                "sign": sign
+            }]
+        }
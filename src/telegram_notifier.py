@@ -2,9 +2,13 @@
 Telegram 通知模块
 用于发送交易通知和状态更新
 """
+import queue
+import atexit
 import logging
+import threading
+import time
 import requests
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 from dataclasses import dataclass
 
@@ -14,32 +18,98 @@ from config import TelegramConfig
 class TelegramNotifier:
     """Telegram 通知器"""
     
-    def __init__(self, config: TelegramConfig):
+    # 退出时等待发送队列清空的最长时间（秒）
+    CLOSE_TIMEOUT = 10
+    # 发送队列容量，Telegram 长时间不可用时丢弃新消息而不是无限堆积
+    MAX_QUEUE_SIZE = 256
+    # 相邻两条消息的最小间隔（秒），Telegram 对单个聊天限制约每秒 1 条
+    MIN_SEND_INTERVAL = 1.0
+    # 同一 dedupe_key 的消息在该时间（秒）内只发送一次
+    DEDUPE_WINDOW = 60
+    # 单次 API 请求超时（秒），Telegram 不可用时尽快放弃，避免后台队列积压
+    REQUEST_TIMEOUT = 5
+    
+    def __init__(self, config: TelegramConfig, background: bool = True):
+        """
+        Args:
+            config: Telegram 配置
+            background: 是否由后台线程发送（调用方不等待 HTTP 往返）
+        """
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.base_url = f"https://api.telegram.org/bot{config.bot_token}"
+        # 复用 HTTP 连接（keep-alive），连续通知不再每条重新握手 TLS；
+        # 首次发送时才创建，通知禁用或 status / test 模式不发送时不建立会话
+        self.session: Optional[requests.Session] = None
+        
+        # 后台发送队列，首次发送时启动工作线程
+        self.background = background
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=self.MAX_QUEUE_SIZE)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        # 各 dedupe_key 最近一次发送的 monotonic 时间
+        self._last_sent: Dict[str, float] = {}
+    
+    def _ensure_worker(self):
+        """启动后台发送线程（进程退出时自动发送完剩余消息）"""
+        with self._worker_lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._worker_loop, name="telegram-sender", daemon=True)
+            self._worker.start()
+            atexit.register(self.close)
+    
+    def _worker_loop(self):
+        """后台线程：按顺序发送队列中的消息（间隔不小于 MIN_SEND_INTERVAL），收到 None 时退出"""
+        last_delivery = 0.0
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            wait = last_delivery + self.MIN_SEND_INTERVAL - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                self._deliver(*item)
+            except Exception as e:
+                self.logger.error("Telegram 后台发送异常: %s", e)
+            last_delivery = time.monotonic()
+    
+    def close(self):
+        """发送完队列中剩余消息后停止后台线程"""
+        worker = self._worker
+        if not worker or not worker.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=self.CLOSE_TIMEOUT)
+        except queue.Full:
+            return
+        worker.join(timeout=self.CLOSE_TIMEOUT)
         
     def _send_request(self, method: str, data: dict) -> dict:
         """发送 Telegram API 请求"""
         url = f"{self.base_url}/{method}"
+        if self.session is None:
+            self.session = requests.Session()
         try:
-            response = requests.post(url, json=data, timeout=30)
+            response = self.session.post(url, json=data, timeout=self.REQUEST_TIMEOUT)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            self.logger.error(f"Telegram API 请求失败: {e}")
+            self.logger.error("Telegram API 请求失败: %s", e)
             return {"ok": False, "error": str(e)}
     
-    def send_message(self, text: str, parse_mode: str = "HTML") -> bool:
+    def send_message(self, text: str, parse_mode: str = "HTML", dedupe_key: str = None) -> bool:
         """
         发送消息
         
         Args:
             text: 消息内容
             parse_mode: 解析模式 (HTML, Markdown, MarkdownV2)
+            dedupe_key: 去重键，相同键的消息 DEDUPE_WINDOW 秒内只发送一次
             
         Returns:
-            是否发送成功
+            是否发送成功（后台发送时为是否已加入发送队列）
         """
         if not self.config.enabled:
             self.logger.debug("Telegram 通知已禁用")
@@ -49,6 +119,31 @@ class TelegramNotifier:
             self.logger.warning("Telegram 配置不完整，跳过通知")
             return False
         
+        if dedupe_key is not None:
+            now = time.monotonic()
+            last = self._last_sent.get(dedupe_key)
+            if last is not None and now - last < self.DEDUPE_WINDOW:
+                self.logger.debug("Telegram 重复通知已合并: %s", dedupe_key)
+                return True
+        
+        if self.background:
+            self._ensure_worker()
+            try:
+                self._queue.put_nowait((text, parse_mode))
+            except queue.Full:
+                # 未入队的通知不记录去重时间，之后的同类通知仍可发送
+                self.logger.warning("Telegram 发送队列已满，丢弃通知")
+                return False
+            sent = True
+        else:
+            sent = self._deliver(text, parse_mode)
+        
+        if sent and dedupe_key is not None:
+            self._last_sent[dedupe_key] = now
+        return sent
+    
+    def _deliver(self, text: str, parse_mode: str) -> bool:
+        """调用 sendMessage 发送消息"""
         data = {
             "chat_id": self.config.chat_id,
             "text": text,
@@ -61,7 +156,7 @@ class TelegramNotifier:
             self.logger.info("Telegram 消息发送成功")
             return True
         else:
-            self.logger.error(f"Telegram 消息发送失败: {result}")
+            self.logger.error("Telegram 消息发送失败: %s", result)
             return False
     
     def send_grid_buy_notification(
@@ -195,7 +290,7 @@ class TelegramNotifier:
 
 ⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
-        return self.send_message(message.strip())
+        return self.send_message(message.strip(), dedupe_key="position_limit")
     
     def send_trade_open_notification(
         self,
@@ -324,7 +419,7 @@ class TelegramNotifier:
 
 ⏰ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 """
-        return self.send_message(message.strip())
+        return self.send_message(message.strip(), dedupe_key=f"error:{error_message}")
     
     def send_bot_status(
         self,
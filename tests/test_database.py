@@ -0,0 +1,117 @@
+"""
+交易数据库测试
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from database import TradingDatabase
+
+
+SYMBOL = "SOL-USDT-SWAP"
+
+
+def make_db() -> TradingDatabase:
+    """在临时目录创建数据库"""
+    return TradingDatabase(os.path.join(tempfile.mkdtemp(), "test.db"))
+
+
+def remove_db(db: TradingDatabase):
+    """关闭并删除临时数据库"""
+    db.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db.db_path + suffix):
+            os.remove(db.db_path + suffix)
+    os.rmdir(os.path.dirname(db.db_path))
+
+
+def test_sell_rollback_on_error():
+    """测试卖出记录中途异常时立即回滚，不遗留写事务"""
+    db = make_db()
+    db.record_buy(SYMBOL, 120.0, 1)
+    db.record_buy(SYMBOL, 110.0, 2)
+    
+    def fail(*args):
+        raise RuntimeError("写入每日统计失败")
+    db._update_daily_stats = fail
+    
+    try:
+        db.record_sell_fifo(SYMBOL, 115.0, 2)
+        assert False, "应抛出异常"
+    except RuntimeError:
+        pass
+    
+    # FIFO 扣减已回滚，连接上没有未提交的事务
+    assert not db._local.conn.in_transaction
+    assert db.get_total_position(SYMBOL) == (3.0, (120.0 + 220.0) / 3)
+    assert db.get_statistics(SYMBOL)["total_trades"] == 0
+    
+    # 其他连接可以立即写入（写锁已释放）
+    other = sqlite3.connect(db.db_path, timeout=0.1)
+    other.execute("INSERT INTO daily_stats (date) VALUES ('2000-01-01')")
+    other.commit()
+    other.close()
+    
+    remove_db(db)
+    print("✓ 卖出回滚测试通过")
+
+
+def test_open_transaction_not_discarded():
+    """测试事务中再次获取连接时不回滚已写入的部分"""
+    db = make_db()
+    conn = db._get_connection()
+    with conn:
+        conn.execute("INSERT INTO daily_stats (date) VALUES ('2000-01-01')")
+        assert db._get_connection() is conn
+        assert conn.in_transaction
+    
+    row = conn.execute("SELECT COUNT(*) FROM daily_stats WHERE date = '2000-01-01'").fetchone()
+    assert row[0] == 1
+    
+    remove_db(db)
+    print("✓ 嵌套获取连接测试通过")
+
+
+def test_statistics_aggregate():
+    """测试交易统计单次查询结果"""
+    db = make_db()
+    db.record_buy(SYMBOL, 120.0, 1)
+    db.record_buy(SYMBOL, 100.0, 3)
+    db.add_reserved_position(SYMBOL, 100.0, 1)
+    db.record_sell_fifo(SYMBOL, 110.0, 2)
+    
+    stats = db.get_statistics(SYMBOL)
+    assert stats["total_trades"] == 1
+    assert stats["loss_count"] == 1 and stats["win_count"] == 0
+    assert stats["total_pnl"] == 0.0
+    assert stats["total_volume"] == 220.0
+    assert stats["reserved_quantity"] == 1.0
+    assert stats["position_quantity"] == 2.0
+    assert stats["position_avg_price"] == 100.0
+    
+    # 不指定交易对时不统计持仓
+    stats = db.get_statistics()
+    assert stats["total_trades"] == 1
+    assert stats["position_quantity"] == 0 and stats["position_avg_price"] == 0
+    
+    # 其他交易对不计入
+    assert db.get_statistics("BTC-USDT-SWAP")["total_trades"] == 0
+    
+    remove_db(db)
+    print("✓ 交易统计测试通过")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("运行交易数据库测试")
+    print("=" * 60)
+    
+    test_sell_rollback_on_error()
+    test_open_transaction_not_discarded()
+    test_statistics_aggregate()
+    
+    print("\n" + "=" * 60)
+    print("所有测试通过! ✓")
+    print("=" * 60)
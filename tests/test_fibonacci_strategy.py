@@ -0,0 +1,79 @@
+"""
+斐波那契策略测试
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from fibonacci_strategy import (
+    FibonacciStrategyEngine,
+    FibonacciConfig,
+    get_target_position_at_price,
+)
+
+
+def make_engine(num_levels: int = 15) -> FibonacciStrategyEngine:
+    """创建 $100-$160、最大 40 张的策略引擎"""
+    return FibonacciStrategyEngine(FibonacciConfig(price_min=100.0, price_max=160.0,
+                                                   max_position=40, num_levels=num_levels))
+
+
+def sample_prices(engine: FibonacciStrategyEngine) -> list:
+    """每个点位上、点位两侧及相邻点位之间的价格"""
+    prices = [engine.config.price_min - 1, engine.config.price_max + 1]
+    fib_prices = engine._fib_prices
+    for i, fib_price in enumerate(fib_prices):
+        prices += [fib_price, fib_price - 0.01, fib_price + 0.01]
+        if i + 1 < len(fib_prices):
+            prices.append((fib_price + fib_prices[i + 1]) / 2)
+    return prices
+
+
+def linear_crossed_level(engine: FibonacciStrategyEngine, old_price: float, new_price: float):
+    """逐个点位检查穿越（二分查找前的实现）"""
+    for i, (level, fib_price, target_pos) in enumerate(engine.fib_levels):
+        if old_price > fib_price >= new_price:
+            return i, level, fib_price, target_pos
+        if old_price < fib_price <= new_price:
+            return i, level, fib_price, target_pos
+    return None
+
+
+def test_target_position_bisect():
+    """测试二分查找的目标持仓与 get_target_position_at_price 一致"""
+    for num_levels in (2, 7, 15):
+        engine = make_engine(num_levels)
+        for price in sample_prices(engine):
+            expected = get_target_position_at_price(price, engine.fib_levels)
+            if price <= engine.config.price_min:
+                expected = engine.config.max_position
+            elif price >= engine.config.price_max:
+                expected = 0
+            assert engine.calculate_target_position(price) == expected, price
+    
+    print("✓ 目标持仓二分查找测试通过")
+
+
+def test_crossed_level_bisect():
+    """测试二分查找的穿越点位与逐个检查的结果一致"""
+    engine = make_engine()
+    prices = sample_prices(engine)
+    for old_price in prices:
+        for new_price in prices:
+            assert engine.find_crossed_fib_level(old_price, new_price) == \
+                linear_crossed_level(engine, old_price, new_price), (old_price, new_price)
+    
+    print("✓ 穿越点位二分查找测试通过")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("运行斐波那契策略测试")
+    print("=" * 60)
+    
+    test_target_position_bisect()
+    test_crossed_level_bisect()
+    
+    print("\n" + "=" * 60)
+    print("所有测试通过! ✓")
+    print("=" * 60)
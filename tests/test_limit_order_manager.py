@@ -0,0 +1,377 @@
+"""
+限价单管理器测试
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from fibonacci_strategy import FibonacciStrategyEngine, FibonacciConfig
+from limit_order_manager import (
+    LimitOrderManager, LimitOrder, ALLOWED_OFFSETS, adjust_buy_price, adjust_sell_price
+)
+
+
+def make_manager() -> LimitOrderManager:
+    """创建不连接交易所的管理器（$100 - $160，15 个点位）"""
+    engine = FibonacciStrategyEngine(FibonacciConfig(price_min=100.0, price_max=160.0, max_position=40))
+    return LimitOrderManager(
+        okx_client=None,
+        strategy_engine=engine,
+        telegram=None,
+        database=None
+    )
+
+
+def linear_adjacent_levels(fib_levels, current_price, direction):
+    """逐个遍历点位的参考实现"""
+    if direction == "lower":
+        levels = [(i, *lv) for i, lv in enumerate(fib_levels) if lv[1] < current_price]
+        return (levels[-1] if levels else None), (levels[-2] if len(levels) >= 2 else None)
+    levels = [(i, *lv) for i, lv in enumerate(fib_levels) if lv[1] > current_price]
+    return (levels[0] if levels else None), (levels[1] if len(levels) >= 2 else None)
+
+
+def test_adjacent_levels_example():
+    """测试 README 示例：价格 $135"""
+    manager = make_manager()
+    
+    lower_l1, lower_l2 = manager.get_two_adjacent_fib_levels(135.0, "lower")
+    assert lower_l1[2] == 133.0 and lower_l1[3] == 18
+    assert lower_l2[2] == 130.0 and lower_l2[3] == 20
+    
+    upper_l1, upper_l2 = manager.get_two_adjacent_fib_levels(135.0, "upper")
+    assert abs(upper_l1[2] - 137.08) < 1e-9 and upper_l1[3] == 15
+    assert upper_l2[2] == 142.0 and upper_l2[3] == 12
+    
+    print("✓ 相邻点位示例测试通过")
+
+
+def test_adjacent_levels_edges():
+    """测试边界：价格正好在点位上、低于最低点、高于最高点"""
+    manager = make_manager()
+    fib_levels = manager.strategy.fib_levels
+    
+    # 行情价格按最小变动单位 0.01 报价
+    test_prices = [90.0, 100.0, 100.01, 130.0, 137.07, 137.08, 137.09, 159.99, 160.0, 170.0]
+    test_prices += [round(fib_price, 2) for _, fib_price, _ in fib_levels]
+    
+    for price in test_prices:
+        for direction in ("lower", "upper"):
+            expected = linear_adjacent_levels(fib_levels, price, direction)
+            actual = manager.get_two_adjacent_fib_levels(price, direction)
+            assert actual == expected, f"价格 {price} {direction}: 期望 {expected}, 实际 {actual}"
+    
+    # 价格正好在点位上时，该点位既不算下方也不算上方
+    lower_l1, _ = manager.get_two_adjacent_fib_levels(130.0, "lower")
+    upper_l1, _ = manager.get_two_adjacent_fib_levels(130.0, "upper")
+    assert lower_l1[2] == 127.0
+    assert upper_l1[2] == 133.0
+    
+    # 超出范围
+    assert manager.get_two_adjacent_fib_levels(100.0, "lower") == (None, None)
+    assert manager.get_two_adjacent_fib_levels(160.0, "upper") == (None, None)
+    
+    print("✓ 相邻点位边界测试通过")
+
+
+def test_price_tables():
+    """测试预计算挂单价格表与价格调整函数一致"""
+    manager = make_manager()
+    
+    for _, fib_price, _ in manager.strategy.fib_levels:
+        for level in (1, 2):
+            is_level2 = level == 2
+            buy_prices = manager._buy_price_table[fib_price][level - 1]
+            sell_prices = manager._sell_price_table[fib_price][level - 1]
+            assert buy_prices == tuple(adjust_buy_price(fib_price, is_level2, o) for o in ALLOWED_OFFSETS)
+            assert sell_prices == tuple(adjust_sell_price(fib_price, is_level2, o) for o in ALLOWED_OFFSETS)
+    
+    # README 示例: $130 一级买入 -> $129.2 / $129.3 / $129.6 / $129.7，二级再 -1U
+    assert manager._buy_price_table[130.0][0] == (129.2, 129.3, 129.6, 129.7)
+    assert manager._buy_price_table[130.0][1] == (128.2, 128.3, 128.6, 128.7)
+    
+    print("✓ 挂单价格表测试通过")
+
+
+class CountingDatabase:
+    """记录 get_total_position 调用次数的假数据库"""
+    
+    def __init__(self):
+        self.position_queries = 0
+        self.lots = [(10, 130.0)]
+    
+    def get_total_position(self, symbol):
+        self.position_queries += 1
+        total_qty = sum(qty for qty, _ in self.lots)
+        return total_qty, sum(qty * price for qty, price in self.lots) / total_qty
+    
+    def record_buy(self, symbol, entry_price, quantity, direction, notes):
+        self.lots.append((quantity, entry_price))
+    
+    def record_sell_fifo(self, symbol, exit_price, quantity, direction):
+        pass
+
+
+def test_avg_cost_cache():
+    """测试平均成本缓存：连续计算利润只查询一次数据库，记录交易后重新查询"""
+    manager = make_manager()
+    db = CountingDatabase()
+    manager.db = db
+    
+    sell = LimitOrder("1", "c1", "sell", 140.0, 2, 0.618, 137.08)
+    assert manager._calculate_profit(sell) == 20.0
+    assert manager._calculate_profit(sell) == 20.0
+    assert db.position_queries == 1
+    
+    manager._record_trade(LimitOrder("2", "c2", "buy", 120.0, 10, 0.5, 130.0))
+    assert manager._calculate_profit(sell) == 30.0
+    assert db.position_queries == 2
+    
+    print("✓ 平均成本缓存测试通过")
+
+
+class BatchCancelClient:
+    """记录批量撤单请求的假交易所客户端"""
+    
+    def __init__(self, pending_count):
+        self.pending = [{"ordId": str(i), "side": "buy", "px": "130", "sz": "1"} for i in range(pending_count)]
+        self.batches = []
+    
+    def get_orders_pending(self, inst_type, inst_id):
+        return {"code": "0", "data": self.pending}
+    
+    def cancel_batch_orders(self, orders):
+        self.batches.append(orders)
+        # 第一个订单已成交，其余撤销成功
+        return {"code": "0", "data": [
+            {"ordId": o["ordId"], "sCode": "51400" if o["ordId"] == "0" else "0"} for o in orders
+        ]}
+
+
+def test_sync_batch_cancel():
+    """测试启动同步时批量撤销旧订单（每批最多 20 个）"""
+    manager = make_manager()
+    client = BatchCancelClient(25)
+    manager.client = client
+    
+    manager.sync_with_exchange()
+    assert [len(batch) for batch in client.batches] == [20, 5]
+    
+    buy = LimitOrder("0", "c0", "buy", 129.3, 2, 0.5, 130.0)
+    sell = LimitOrder("1", "c1", "sell", 137.7, 2, 0.618, 137.08)
+    manager.active_buy_order_l1, manager.active_sell_order_l1 = buy, sell
+    client.batches.clear()
+    
+    manager._cancel_all_orders()
+    assert len(client.batches) == 1
+    assert buy.status == "live" and sell.status == "canceled"
+    assert manager.active_buy_order_l1 is None and manager.active_sell_order_l1 is None
+    
+    print("✓ 批量撤单测试通过")
+
+
+def test_client_order_id():
+    """测试客户端订单 ID 符合 OKX 格式且各实例互不重复"""
+    first, second = make_manager(), make_manager()
+    ids = [m._generate_client_order_id(side, level) for m in (first, second)
+           for side in ("buy", "sell") for level in (1, 2)]
+    
+    assert len(set(ids)) == len(ids)
+    for client_order_id in ids:
+        assert client_order_id.isalnum() and len(client_order_id) <= 32
+    
+    print("✓ 客户端订单 ID 测试通过")
+
+
+class PlacingClient:
+    """记录批量下单请求的假交易所客户端"""
+    
+    def __init__(self):
+        self.placed = 0
+        self.requests = []
+    
+    def place_batch_orders(self, orders):
+        self.requests.append(("place", len(orders)))
+        data = []
+        for _ in orders:
+            self.placed += 1
+            data.append({"sCode": "0", "ordId": str(self.placed)})
+        return {"code": "0", "data": data}
+    
+    def cancel_batch_orders(self, orders):
+        self.requests.append(("cancel", len(orders)))
+        return {"code": "0", "data": [{"sCode": "0"} for _ in orders]}
+    
+    def cancel_order(self, inst_id, ord_id):
+        self.requests.append(("cancel", 1))
+        return {"code": "0", "data": [{"sCode": "0"}]}
+
+
+def test_update_orders_noop():
+    """测试行情停留在同一点位区间且持仓不变时跳过挂单规划"""
+    manager = make_manager()
+    client = PlacingClient()
+    manager.client = client
+    
+    manager.update_orders(135.0, 15)
+    assert client.requests == [("place", 3)]
+    
+    # 同一区间内的价格波动不产生任何请求
+    manager.update_orders(135.5, 15)
+    assert manager._last_noop_key is not None
+    manager.update_orders(134.2, 15)
+    assert client.requests == [("place", 3)]
+    
+    # 持仓变化后重新规划
+    manager.update_orders(134.2, 16)
+    assert len(client.requests) > 1
+    
+    print("✓ 挂单决策缓存测试通过")
+
+
+def test_ws_order_events():
+    """测试 WebSocket 推送的成交事件经队列交给策略线程处理"""
+    manager = make_manager()
+    manager.on_ws_connected()
+    # 模拟重连后已完成一次 REST 对账
+    manager._ws_synced_generation = manager._ws_generation
+    
+    buy = LimitOrder("11", "c11", "buy", 132.6, 3, 0.55, 133.0)
+    manager.active_buy_order_l1 = buy
+    
+    manager.on_ws_orders([
+        {"instId": manager.symbol, "ordId": "11", "state": "live"},
+        {"instId": "BTC-USDT-SWAP", "ordId": "12", "state": "filled"},
+        {"instId": manager.symbol, "ordId": "11", "state": "filled"}
+    ])
+    assert manager._ws_order_states == {}
+    
+    filled = manager.check_filled_orders(15)
+    assert filled == [buy] and buy.status == "filled"
+    assert manager.active_buy_order_l1 is None
+    assert manager._ws_events.empty()
+    
+    print("✓ 订单推送队列测试通过")
+
+
+class FakeWebSocket:
+    """记录 WebSocket 下单请求的假私有连接"""
+    
+    def __init__(self, connected, timeout=False):
+        self.connected = connected
+        self.timeout = timeout
+        self.requests = []
+    
+    def request(self, op, args):
+        if not self.connected:
+            raise ConnectionError("WebSocket 未连接")
+        self.requests.append((op, len(args)))
+        if self.timeout:
+            raise TimeoutError("WebSocket 请求超时")
+        return {"code": "0", "data": [{"sCode": "0", "ordId": f"ws{i}"} for i in range(len(args))]}
+
+
+def test_ws_order_placement():
+    """测试私有连接可用时通过 WebSocket 下单，不可用时回退 REST"""
+    manager = make_manager()
+    client = PlacingClient()
+    manager.client = client
+    manager.ws_client = FakeWebSocket(connected=True)
+    
+    manager.update_orders(135.0, 15)
+    assert manager.ws_client.requests == [("batch-orders", 3)]
+    assert client.requests == []
+    assert all(order.order_id.startswith("ws") for order in manager.active_orders())
+    
+    # 连接断开时改用 REST 批量下单
+    manager = make_manager()
+    manager.client = client
+    manager.ws_client = FakeWebSocket(connected=False)
+    manager.update_orders(135.0, 15)
+    assert client.requests == [("place", 3)]
+    
+    print("✓ WebSocket 下单测试通过")
+
+
+class LookupClient(PlacingClient):
+    """按 clOrdId 返回查询结果的假交易所客户端：依次为已挂出、不存在、查询失败"""
+    
+    def __init__(self):
+        super().__init__()
+        self.lookups = []
+        self.canceled_clids = []
+    
+    def get_order(self, inst_id, cl_ord_id):
+        self.lookups.append(cl_ord_id)
+        if len(self.lookups) == 1:
+            return {"code": "0", "data": [{"ordId": "live1", "clOrdId": cl_ord_id, "state": "live"}]}
+        if len(self.lookups) == 2:
+            return {"code": "51603", "msg": "Order does not exist", "data": []}
+        return {"code": "-1", "msg": "timeout", "data": []}
+    
+    def cancel_order(self, inst_id, cl_ord_id):
+        self.canceled_clids.append(cl_ord_id)
+        return {"code": "0", "data": [{"sCode": "0"}]}
+
+
+def test_ws_order_timeout():
+    """测试 WebSocket 下单超时：按 clOrdId 查询结果，接管已挂出的订单，不重新下单"""
+    manager = make_manager()
+    client = LookupClient()
+    manager.client = client
+    manager.ws_client = FakeWebSocket(connected=True, timeout=True)
+    
+    manager.update_orders(135.0, 15)
+    assert manager.ws_client.requests == [("batch-orders", 3)]
+    assert len(client.lookups) == 3
+    assert client.requests == []
+    
+    # 已挂出的订单被接管，不存在的订单视为失败，查询失败的订单按 clOrdId 撤销
+    active = manager.active_orders()
+    assert [order.order_id for order in active] == ["live1"]
+    assert active[0].client_order_id == client.lookups[0]
+    assert client.canceled_clids == [client.lookups[2]]
+    
+    print("✓ WebSocket 下单超时测试通过")
+
+
+def test_price_bracket():
+    """测试点位区间与相邻点位查询一致：区间相同则相邻点位相同"""
+    manager = make_manager()
+    
+    prices = [95.0, 100.0, 100.004, 112.3, 113.9, 130.0, 130.01, 135.5, 159.99, 160.0, 161.0]
+    for a in prices:
+        for b in prices:
+            if manager.price_bracket(a) == manager.price_bracket(b):
+                for direction in ("lower", "upper"):
+                    assert manager.get_two_adjacent_fib_levels(a, direction) == \
+                        manager.get_two_adjacent_fib_levels(b, direction), (a, b, direction)
+    
+    # 点位价格本身单独成区间
+    assert manager.price_bracket(130.0) != manager.price_bracket(129.99)
+    assert manager.price_bracket(130.0) != manager.price_bracket(130.01)
+    assert manager.price_bracket(130.5) == manager.price_bracket(132.9)
+    
+    print("✓ 点位区间测试通过")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("运行限价单管理器测试")
+    print("=" * 60)
+    
+    test_adjacent_levels_example()
+    test_adjacent_levels_edges()
+    test_price_tables()
+    test_avg_cost_cache()
+    test_sync_batch_cancel()
+    test_client_order_id()
+    test_update_orders_noop()
+    test_ws_order_events()
+    test_ws_order_placement()
+    test_ws_order_timeout()
+    test_price_bracket()
+    
+    print("\n" + "=" * 60)
+    print("所有测试通过! ✓")
+    print("=" * 60)
@@ -0,0 +1,248 @@
+"""
+交易机器人主循环测试（推送处理、价格 / 持仓查询）
+"""
+import sys
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import main
+from main import TradingBot, PositionUnavailable
+from okx_client import OKXClient
+from fibonacci_strategy import FibonacciStrategyEngine, FibonacciConfig
+from limit_order_manager import LimitOrderManager
+
+
+def position_data(pos):
+    """OKX 持仓数据（REST 和推送格式相同）"""
+    return {"instId": "SOL-USDT-SWAP", "posSide": "net", "pos": str(pos), "avgPx": "130",
+            "upl": "0", "uplRatio": "0", "lever": "2", "margin": "100"}
+
+
+class FakeOKXClient:
+    """按预设结果返回行情和持仓的假交易所客户端"""
+    
+    def __init__(self, price="135.5", positions=None):
+        self.price = price
+        self.positions = positions
+        self.ticker_calls = 0
+        self.position_calls = 0
+        self.orders = []
+        self.order_result = {"code": "0", "data": [{"sCode": "0"}]}
+        # 持仓查询期间执行的回调（模拟查询期间到达的推送）
+        self.during_position_query = None
+    
+    def get_ticker(self, inst_id):
+        self.ticker_calls += 1
+        if isinstance(self.price, Exception):
+            raise self.price
+        if self.price is None:
+            return {"code": "50011", "msg": "Too Many Requests", "data": []}
+        return {"code": "0", "data": [{"last": self.price}]}
+    
+    def get_positions(self, inst_type, inst_id):
+        self.position_calls += 1
+        if self.during_position_query:
+            self.during_position_query()
+        if isinstance(self.positions, Exception):
+            raise self.positions
+        return self.positions
+    
+    def place_order(self, **kwargs):
+        self.orders.append(kwargs)
+        return self.order_result
+
+
+class RecordingOrderManager(LimitOrderManager):
+    """不连接交易所、记录调用的限价单管理器"""
+    
+    def __init__(self, engine):
+        super().__init__(okx_client=None, strategy_engine=engine, telegram=None, database=None)
+        self.updates = []
+    
+    def check_filled_orders(self, current_position):
+        return []
+    
+    def update_orders(self, current_price, current_position):
+        self.updates.append((current_price, current_position))
+
+
+def make_bot(client: FakeOKXClient) -> TradingBot:
+    """创建不初始化日志、数据库和推送连接的机器人"""
+    bot = TradingBot.__new__(TradingBot)
+    bot.logger = logging.getLogger("test_main")
+    bot.symbol = "SOL-USDT-SWAP"
+    bot.okx_client = client
+    bot.fib_strategy = FibonacciStrategyEngine(FibonacciConfig(price_min=100.0, price_max=160.0, max_position=40))
+    bot.order_manager = RecordingOrderManager(bot.fib_strategy)
+    bot._io_pool = ThreadPoolExecutor(max_workers=2)
+    
+    bot.current_position = None
+    bot.last_price = 0.0
+    bot._market_order_until = 0
+    bot._price_cache = None
+    bot._position_cache = None
+    bot._price_ttl_ns = 500_000_000
+    bot._position_ttl_ns = 500_000_000
+    bot._leverage_cache = {}
+    bot._ensure_leverage = lambda: None
+    
+    bot._ws_price = None
+    bot._ws_position = None
+    bot._ws_position_ready = False
+    bot._position_seen_ns = 0
+    bot._ws_bracket = None
+    bot._tick_event = threading.Event()
+    return bot
+
+
+def test_position_failure_not_flat():
+    """测试持仓查询失败时跳过本轮，不当作空仓触发初始化买入"""
+    for failure in ({"code": "50001", "msg": "Service temporarily unavailable", "data": []},
+                    ConnectionError("reset by peer")):
+        client = FakeOKXClient(positions=failure)
+        bot = make_bot(client)
+        
+        try:
+            bot.get_current_position()
+            assert False, "查询失败应抛出 PositionUnavailable"
+        except PositionUnavailable:
+            pass
+        
+        bot.run_once()
+        assert client.orders == []
+        assert bot.order_manager.updates == []
+    
+    # 确认空仓（接口成功且无数据）时返回 None
+    client = FakeOKXClient(positions={"code": "0", "data": []})
+    bot = make_bot(client)
+    assert bot.get_current_position() is None
+    
+    print("✓ 持仓查询失败测试通过")
+
+
+def test_market_buy_guard():
+    """测试初始化市价单被明确拒绝时不等待持仓更新，结果未知时等待"""
+    client = FakeOKXClient(positions={"code": "0", "data": []})
+    bot = make_bot(client)
+    
+    # 交易所明确拒绝：下一轮重新下单
+    client.order_result = {"code": "1", "msg": "", "data": [{"sCode": "51008", "sMsg": "Insufficient margin"}]}
+    bot.run_once()
+    assert len(client.orders) == 1
+    assert bot._market_order_until == 0
+    
+    # 网络错误：结果未知，等待期内不重复下单
+    bot.fib_strategy.last_price = 0
+    bot._position_cache = None
+    client.order_result = {"code": OKXClient.REQUEST_FAILED_CODE, "msg": "Read timed out", "data": []}
+    bot.run_once()
+    assert len(client.orders) == 2
+    bot.fib_strategy.last_price = 0
+    bot._position_cache = None
+    bot.run_once()
+    assert len(client.orders) == 2
+    
+    print("✓ 初始化市价单等待测试通过")
+
+
+def test_reconcile_keeps_newer_push():
+    """测试持仓核对期间收到新推送时，保留推送结果而不被 REST 结果覆盖"""
+    client = FakeOKXClient(positions={"code": "0", "data": [position_data(5)]})
+    bot = make_bot(client)
+    bot._on_ws_message("positions", {}, [position_data(3)])
+    
+    # 推送未过期时不查询 REST
+    assert bot._latest_position().size == 3
+    assert client.position_calls == 0
+    
+    # 推送超过核对间隔后查询 REST，查询期间到达新推送
+    bot._position_seen_ns = 0
+    client.during_position_query = lambda: bot._on_ws_message("positions", {}, [position_data(4)])
+    assert bot._latest_position().size == 5
+    assert bot._ws_position.size == 4
+    
+    # 之后继续使用较新的推送
+    client.during_position_query = None
+    assert bot._latest_position().size == 4
+    assert client.position_calls == 1
+    
+    # 核对期间无新推送时，以 REST 结果校正
+    bot._position_seen_ns = 0
+    assert bot._latest_position().size == 5
+    assert bot._ws_position.size == 5
+    
+    # 核对失败时沿用推送持仓
+    bot._position_seen_ns = 0
+    client.positions = ConnectionError("timeout")
+    assert bot._latest_position().size == 5
+    
+    print("✓ 持仓核对测试通过")
+
+
+def test_price_cache_and_stale_fallback():
+    """测试价格缓存、查询失败沿用旧价格，以及 force 不使用缓存和旧价格"""
+    client = FakeOKXClient(price="135.5")
+    bot = make_bot(client)
+    
+    assert bot.get_current_price() == 135.5
+    assert bot.get_current_price() == 135.5
+    assert client.ticker_calls == 1
+    
+    # 缓存过期后查询失败：STALE_PRICE_LIMIT 内沿用上次价格，force 时不沿用
+    bot._price_cache = (main._now_ns() - bot._price_ttl_ns, 135.5)
+    client.price = None
+    assert bot.get_current_price() == 135.5
+    assert bot.get_current_price(force=True) is None
+    
+    # 超过 STALE_PRICE_LIMIT 后不再沿用
+    bot._price_cache = (main._now_ns() - (bot.STALE_PRICE_LIMIT + 1) * 1_000_000_000, 135.5)
+    assert bot.get_current_price() is None
+    
+    print("✓ 价格缓存测试通过")
+
+
+def test_ws_ticker_push():
+    """测试行情推送：记录价格，只在跨越点位区间时唤醒主循环"""
+    client = FakeOKXClient(price="120.0")
+    bot = make_bot(client)
+    
+    bot._on_ws_message("tickers", {}, [{"last": "135.5"}])
+    assert bot._tick_event.is_set()
+    assert bot._latest_price() == 135.5
+    assert client.ticker_calls == 0
+    
+    # 同一区间内的价格变化只更新价格
+    bot._tick_event.clear()
+    bot._on_ws_message("tickers", {}, [{"last": "134.2"}])
+    assert not bot._tick_event.is_set()
+    assert bot._latest_price() == 134.2
+    
+    # 跨越点位后唤醒
+    bot._on_ws_message("tickers", {}, [{"last": "132.9"}])
+    assert bot._tick_event.is_set()
+    
+    # 推送价格过期后回退 REST
+    bot._ws_price = (main._now_ns() - (bot.WS_PRICE_MAX_AGE + 1) * 1_000_000_000, 132.9)
+    assert bot._latest_price() == 120.0
+    assert client.ticker_calls == 1
+    
+    print("✓ 行情推送测试通过")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("运行交易机器人主循环测试")
+    print("=" * 60)
+    
+    test_position_failure_not_flat()
+    test_market_buy_guard()
+    test_reconcile_keeps_newer_push()
+    test_price_cache_and_stale_fallback()
+    test_ws_ticker_push()
+    
+    print("\n" + "=" * 60)
+    print("所有测试通过! ✓")
+    print("=" * 60)
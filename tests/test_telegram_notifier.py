@@ -0,0 +1,98 @@
+"""
+Telegram 通知器测试
+"""
+import sys
+import os
+import queue
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config import TelegramConfig
+from telegram_notifier import TelegramNotifier
+
+
+class FakeResponse:
+    """sendMessage 成功响应"""
+    
+    def raise_for_status(self):
+        pass
+    
+    def json(self):
+        return {"ok": True}
+
+
+class FakeSession:
+    """记录发送内容的假 HTTP 会话"""
+    
+    def __init__(self):
+        self.sent = []
+    
+    def post(self, url, json, timeout):
+        self.sent.append(json["text"])
+        return FakeResponse()
+
+
+def make_notifier(background: bool) -> TelegramNotifier:
+    """创建不访问网络的通知器"""
+    notifier = TelegramNotifier(TelegramConfig(bot_token="token", chat_id="1"), background=background)
+    notifier.session = FakeSession()
+    return notifier
+
+
+def test_dedupe_window():
+    """测试同一去重键在 DEDUPE_WINDOW 内只发送一次，无去重键的消息不受影响"""
+    notifier = make_notifier(background=False)
+    
+    assert notifier.send_message("持仓超限", dedupe_key="limit")
+    assert notifier.send_message("持仓超限", dedupe_key="limit")
+    assert notifier.send_message("普通通知")
+    assert notifier.send_message("普通通知")
+    assert notifier.session.sent == ["持仓超限", "普通通知", "普通通知"]
+    
+    # 超过去重窗口后再次发送
+    notifier._last_sent["limit"] -= notifier.DEDUPE_WINDOW
+    assert notifier.send_message("持仓超限", dedupe_key="limit")
+    assert notifier.session.sent.count("持仓超限") == 2
+    
+    print("✓ 通知去重测试通过")
+
+
+def test_session_created_on_first_send():
+    """测试 HTTP 会话在首次发送时才创建，通知禁用时不创建"""
+    notifier = TelegramNotifier(TelegramConfig(bot_token="token", chat_id="1", enabled=False), background=False)
+    assert notifier.send_message("启动")
+    assert notifier.session is None
+    
+    print("✓ 延迟创建会话测试通过")
+
+
+def test_dropped_message_not_deduped():
+    """测试发送队列已满被丢弃的通知不记录去重时间，之后可以重新发送"""
+    notifier = make_notifier(background=True)
+    # 不启动后台线程，直接检查队列内容
+    notifier._ensure_worker = lambda: None
+    notifier._queue = queue.Queue(maxsize=1)
+    notifier._queue.put_nowait(("占位", "HTML"))
+    
+    assert not notifier.send_message("下单失败", dedupe_key="error")
+    assert "error" not in notifier._last_sent
+    
+    notifier._queue.get_nowait()
+    assert notifier.send_message("下单失败", dedupe_key="error")
+    assert notifier._queue.get_nowait() == ("下单失败", "HTML")
+    assert "error" in notifier._last_sent
+    
+    print("✓ 丢弃通知去重测试通过")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("运行 Telegram 通知器测试")
+    print("=" * 60)
+    
+    test_dedupe_window()
+    test_session_created_on_first_send()
+    test_dropped_message_not_deduped()
+    
+    print("\n" + "=" * 60)
+    print("所有测试通过! ✓")
+    print("=" * 60)